@@ -0,0 +1,92 @@
+"""Compare one-off requests.get calls with the pooled API client.
+
+Starts a local keep-alive HTTP stub that answers every GET with a small JSON
+list, then times "pages" of several sequential API calls made either with a
+fresh module-level ``requests.get`` per call (a new connection each time, as
+the views used to) or through ``views.api_client`` (pooled keep-alive
+connections). ``--handshake-ms`` adds a delay to every new connection to
+stand in for the network round trips of a real TCP/TLS handshake.
+
+Usage (from django_frontend/):
+    python benchmarks/api_client_bench.py --pages 300 --calls 5 --handshake-ms 2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BODY = json.dumps([{"id": i, "title": f"Room {i}", "price": 100.0 + i} for i in range(20)]).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections open between requests
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    handshake_delay = 0.0
+
+    def setup(self):
+        super().setup()
+        time.sleep(self.handshake_delay)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def time_pages(fetch, pages, calls):
+    samples = []
+    for _ in range(pages):
+        t0 = time.perf_counter()
+        for _ in range(calls):
+            fetch()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return samples
+
+
+def report(label, samples, calls):
+    p50 = statistics.median(samples) * 1000
+    p95 = samples[int(len(samples) * 0.95)] * 1000
+    print(f"{label:<12} page p50={p50:.2f}ms  p95={p95:.2f}ms  per call={p50 / calls:.3f}ms")
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--calls", type=int, default=5, help="API calls per page")
+    parser.add_argument("--handshake-ms", type=float, default=0.0, help="delay added to every new connection")
+    args = parser.parse_args()
+
+    StubHandler.handshake_delay = args.handshake_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["FASTAPI_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    import requests
+    from views import api_client
+
+    url = api_client.url("/api/rooms/")
+    try:
+        one_off = report("requests.get", time_pages(lambda: requests.get(url, timeout=3).json(), args.pages, args.calls), args.calls)
+        pooled = report("api_client", time_pages(lambda: api_client.get("/api/rooms/").json(), args.pages, args.calls), args.calls)
+    finally:
+        server.shutdown()
+    print(f"pooled client is {one_off / pooled:.1f}x faster per page")
+
+
+if __name__ == "__main__":
+    main()
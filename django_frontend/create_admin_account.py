@@ -14,6 +14,8 @@ django.setup()
 
 from django.contrib.auth.models import User
 
+from views import api_client
+
 def create_admin_account():
     """Create Django user and register in FastAPI admin_users."""
     
@@ -42,8 +44,6 @@ def create_admin_account():
         
         # Create FastAPI admin user
         print(f"\n📝 Creating FastAPI admin user...")
-        api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
-        
         user_data = {
             "username": username,
             "email": email,
@@ -51,7 +51,7 @@ def create_admin_account():
             "password": password
         }
         
-        resp = requests.post(f"{api_base}/api/users", json=user_data, timeout=5)
+        resp = api_client.post("/api/users/", json=user_data, timeout=5)
         
         if resp.status_code in [200, 201]:
             print(f"✅ FastAPI admin user created successfully!")
@@ -70,7 +70,7 @@ def create_admin_account():
             print(f"You may need to manually add this user to the admin list.")
             
     except requests.exceptions.ConnectionError:
-        print(f"\n❌ Cannot connect to FastAPI at {api_base}")
+        print(f"\n❌ Cannot connect to FastAPI at {api_client.API_BASE}")
         print(f"Make sure FastAPI is running on port 8001")
         print(f"\nDjango user was created, but FastAPI user was not.")
         return
@@ -59,6 +59,25 @@ DATABASES = {
     }
 }
 
+# API response cache (views/api_client.py) and admin-membership checks.
+# Local memory is per process; set DJANGO_CACHE_DIR to share one file-based
+# cache (entries and invalidations) between several worker processes.
+if os.environ.get("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["DJANGO_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "staycation-frontend",
+            "OPTIONS": {"MAX_ENTRIES": 1000},
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
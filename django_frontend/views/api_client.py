@@ -0,0 +1,289 @@
+"""Shared client for the FastAPI service.
+
+Every call goes through one ``requests.Session`` whose connection pool keeps
+connections to the API open between requests, so a page that makes several
+API calls (and every later page) reuses warm keep-alive connections instead
+of opening a new TCP connection per call. The pool is thread-safe and shared
+by all request threads.
+
+Configuration, read once at import:
+
+    FASTAPI_URL          base URL of the API (default http://127.0.0.1:8001)
+    API_POOL_SIZE        connections kept open per API host (default 10)
+    API_CONNECT_TIMEOUT  seconds to wait for a connection (default 2)
+    API_READ_TIMEOUT     seconds to wait for a response (default 5)
+    API_FETCH_WORKERS    threads that run the calls of ``fetch_all`` and the
+                         background cache refreshes, shared by every request
+                         thread of the process (default 32); further calls
+                         queue until one is free
+    API_CACHE_ROOMS_TTL  seconds a cached room catalog response is fresh (default 300)
+    API_CACHE_STALE      seconds past its TTL a response may still be served
+                         while it is refreshed in the background (default 3600)
+
+Responses of rarely changing endpoints (the room catalog) are also kept in
+the Django cache, see ``CACHED_ENDPOINTS``. Within its TTL a cached body is
+served without calling the API at all. Once it is stale it is still served
+immediately while a single background refresh fetches the new one; only a
+cold miss waits for the API, and concurrent misses for one URL share one
+call. ``invalidate`` drops a whole group after a write, e.g. when an admin
+edits a room.
+
+Every call passes through the endpoint's circuit breaker (see
+``circuit_breaker``), so a failing API costs callers an immediate error
+instead of a timeout. ``fetch_json`` then answers with the last good body it
+saw for that URL, when it has one.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+from . import circuit_breaker
+
+API_BASE = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001').rstrip('/')
+POOL_SIZE = int(os.environ.get('API_POOL_SIZE', '10'))
+CONNECT_TIMEOUT = float(os.environ.get('API_CONNECT_TIMEOUT', '2'))
+READ_TIMEOUT = float(os.environ.get('API_READ_TIMEOUT', '5'))
+# Sized for the pages in flight at once times the calls each page makes (up
+# to 3), not for the HTTP pool: calls past POOL_SIZE still go out on a
+# short-lived connection, while calls past FETCH_WORKERS wait for a thread
+FETCH_WORKERS = int(os.environ.get('API_FETCH_WORKERS', '32'))
+# Rows per request when fetch_pages walks a whole list (the API's maximum)
+PAGE_SIZE = 1000
+
+# (path pattern, invalidation group, seconds fresh) for responses kept in the
+# Django cache; paths matching none of them are always fetched
+CACHED_ENDPOINTS = (
+    (re.compile(r'/api/rooms/(\d+|search)?$'), 'rooms', int(os.environ.get('API_CACHE_ROOMS_TTL', '300'))),
+)
+STALE_GRACE = int(os.environ.get('API_CACHE_STALE', '3600'))
+# Upper bound on one background refresh; a crashed refresher frees the slot after this
+REFRESH_LOCK_SECONDS = 30
+
+session = requests.Session()
+# Past POOL_SIZE busy connections, extra requests open a connection that is
+# closed afterwards rather than waiting for a pooled one
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
+session.headers['Accept'] = 'application/json'
+
+# Runs the independent calls of one page side by side (see fetch_all) and
+# the background refreshes of stale cache entries
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='api-fetch')
+
+# Last good body per URL, with its ETag if it had one: answers 304s and
+# stands in while the endpoint is failing
+_MAX_ENTRIES = 256
+_validated = OrderedDict()
+_lock = threading.Lock()
+# Cold-miss loads in progress in this process, by cache key
+_inflight = {}
+
+
+def url(path):
+    """Absolute API URL for ``path`` (e.g. ``/api/rooms/``)."""
+    return f"{API_BASE}{path}"
+
+
+def _timeout(timeout):
+    return (CONNECT_TIMEOUT, READ_TIMEOUT if timeout is None else timeout)
+
+
+def request(method, path, timeout=None, **kwargs):
+    """Send a request over the pooled session; ``timeout`` overrides the read timeout.
+
+    Raises ``circuit_breaker.CircuitOpenError`` without calling the API while
+    the endpoint's breaker is open.
+    """
+    breaker = circuit_breaker.breaker_for(method, path)
+    if not breaker.allow():
+        raise circuit_breaker.CircuitOpenError(f"{breaker.name} is failing; not calling it for now")
+    try:
+        resp = session.request(method, url(path), timeout=_timeout(timeout), **kwargs)
+    except requests.RequestException:
+        breaker.record(False)
+        raise
+    breaker.record(resp.status_code < 500)
+    return resp
+
+
+def get(path, params=None, timeout=None, **kwargs):
+    return request('GET', path, params=params, timeout=timeout, **kwargs)
+
+
+def post(path, json=None, timeout=None, **kwargs):
+    return request('POST', path, json=json, timeout=timeout, **kwargs)
+
+
+def fetch_json(path, params=None, timeout=None, cached=True):
+    """GET ``path`` and return its decoded JSON body, or None on a non-200 answer.
+
+    Endpoints listed in ``CACHED_ENDPOINTS`` are answered from the response
+    cache unless ``cached`` is False (e.g. admin pages that must show writes
+    at once).
+    """
+    policy = _cache_policy(path) if cached else None
+    if policy is None:
+        return _get_json(path, params, timeout)
+    group, ttl = policy
+    key = _cache_key(group, requests.Request('GET', url(path), params=params).prepare().url)
+    entry = cache.get(key)
+    if entry is None:
+        return _load_once(key, lambda: _store(key, ttl, _get_json(path, params, timeout)))
+    fetched_at, data = entry
+    # cache.add is atomic, so across threads (and processes sharing the
+    # cache) only one caller schedules the refresh of a stale entry
+    if time.time() - fetched_at >= ttl and cache.add(f"{key}:refreshing", True, REFRESH_LOCK_SECONDS):
+        _executor.submit(_refresh, key, ttl, path, params, timeout)
+    return data
+
+
+def _get_json(path, params, timeout):
+    """Conditional GET of ``path``; the decoded body, or None on a non-200 answer.
+
+    The last good body of every URL is remembered with its ETag. The next
+    request to the same URL sends the ETag as If-None-Match; on 304 the API
+    runs no query and sends no body, and the remembered body is returned
+    instead. When the call fails (connection error, timeout, open circuit or
+    5xx) the remembered body is returned as well; without one the error is
+    raised, or None returned for a 5xx.
+    """
+    key = requests.Request('GET', url(path), params=params).prepare().url
+    with _lock:
+        cached = _validated.get(key)
+    headers = {'If-None-Match': cached[0]} if cached and cached[0] else {}
+
+    try:
+        resp = get(path, params=params, headers=headers, timeout=timeout)
+    except requests.RequestException:
+        if cached:
+            return cached[1]
+        raise
+    if resp.status_code == 304 and cached:
+        with _lock:
+            if key in _validated:
+                _validated.move_to_end(key)
+        return cached[1]
+    if resp.status_code >= 500 and cached:
+        return cached[1]
+    if resp.status_code != 200:
+        return None
+
+    data = resp.json()
+    with _lock:
+        _validated[key] = (resp.headers.get('ETag'), data)
+        _validated.move_to_end(key)
+        while len(_validated) > _MAX_ENTRIES:
+            _validated.popitem(last=False)
+    return data
+
+
+def _cache_policy(path):
+    for pattern, group, ttl in CACHED_ENDPOINTS:
+        if pattern.match(path):
+            return group, ttl
+    return None
+
+
+def _generation_key(group):
+    return f"api-cache-gen:{group}"
+
+
+def _cache_key(group, full_url):
+    # Invalidation moves the group to a new generation instead of deleting
+    # keys, which cache backends cannot enumerate. Generations are
+    # timestamps, so an evicted counter never comes back as an old value.
+    generation = cache.get_or_set(_generation_key(group), time.time_ns(), None)
+    return f"api:{group}:{generation}:{hashlib.sha1(full_url.encode()).hexdigest()}"
+
+
+def invalidate(group):
+    """Turn every cached response of ``group`` (e.g. ``'rooms'``) into a miss."""
+    cache.set(_generation_key(group), time.time_ns(), None)
+
+
+def _store(key, ttl, data):
+    if data is not None:
+        cache.set(key, (time.time(), data), ttl + STALE_GRACE)
+    return data
+
+
+def _load_once(key, load):
+    """Run ``load`` for ``key`` unless this process is already running it; share its result."""
+    with _lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        data = load()
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+    future.set_result(data)
+    return data
+
+
+def _refresh(key, ttl, path, params, timeout):
+    """Background refresh of a stale entry; on failure the stale body stays in place."""
+    try:
+        _store(key, ttl, _get_json(path, params, timeout))
+    except Exception:
+        pass
+    finally:
+        cache.delete(f"{key}:refreshing")
+
+
+def fetch_pages(path, params=None, timeout=None, cached=True):
+    """Every row of a paginated list endpoint, or None when a page could not be fetched.
+
+    List endpoints return at most one page (100 rows unless ``limit`` says
+    otherwise). This asks for ``PAGE_SIZE`` rows at a time and follows the
+    ``after`` cursor, the last id of the previous page, until a short page.
+    Each page goes through ``fetch_json``, so cached endpoints stay cached.
+    """
+    params = {**(params or {}), 'limit': PAGE_SIZE}
+    rows = []
+    while True:
+        page = fetch_json(path, params=params, timeout=timeout, cached=cached)
+        if page is None:
+            return None
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        params['after'] = page[-1]['id']
+
+
+def _fetch_or_none(path, params, timeout):
+    try:
+        return fetch_json(path, params=params, timeout=timeout)
+    except Exception:
+        return None
+
+
+def fetch_all(calls, timeout=None):
+    """Run several independent ``fetch_json`` calls concurrently.
+
+    ``calls`` maps a name to a path or a ``(path, params)`` pair; the result
+    maps each name to its decoded body, or None when that call failed. A page
+    built from several calls waits for the slowest one instead of their sum.
+    """
+    futures = {}
+    for name, call in calls.items():
+        path, params = (call, None) if isinstance(call, str) else call
+        futures[name] = _executor.submit(_fetch_or_none, path, params, timeout)
+    return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,134 @@
+"""Per-endpoint circuit breakers for calls to the FastAPI service.
+
+Each upstream endpoint (``GET /api/rooms/{id}``, ...) gets a breaker that
+remembers the outcome of its last ``WINDOW`` calls. Once at least
+``MIN_CALLS`` of them are recorded and the share of failures (connection
+errors, timeouts and 5xx answers) reaches ``FAILURE_RATE``, the breaker
+opens: calls fail immediately with ``CircuitOpenError`` instead of tying up
+a worker thread for the full timeout. After ``OPEN_SECONDS`` it lets a
+single probe call through (half-open); a success closes it again, a failure
+re-opens it for another ``OPEN_SECONDS``.
+
+Configuration, read once at import:
+
+    API_BREAKER_WINDOW        calls remembered per endpoint (default 20)
+    API_BREAKER_MIN_CALLS     calls needed before the breaker may open (default 5)
+    API_BREAKER_FAILURE_RATE  failure share that opens it (default 0.5)
+    API_BREAKER_OPEN_SECONDS  seconds to fail fast before probing (default 30)
+"""
+
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import requests
+
+WINDOW = int(os.environ.get('API_BREAKER_WINDOW', '20'))
+MIN_CALLS = int(os.environ.get('API_BREAKER_MIN_CALLS', '5'))
+FAILURE_RATE = float(os.environ.get('API_BREAKER_FAILURE_RATE', '0.5'))
+OPEN_SECONDS = float(os.environ.get('API_BREAKER_OPEN_SECONDS', '30'))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling an endpoint whose breaker is open.
+
+    A ConnectionError subclass, so callers that already handle an unreachable
+    API handle this the same way.
+    """
+
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=WINDOW)
+        self.opened_at = None
+        self.probe_started = None
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go out now; in half-open state only one probe at a time."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= OPEN_SECONDS:
+                self.state = HALF_OPEN
+                self.probe_started = None
+            if self.state == HALF_OPEN:
+                # A probe that never reported back frees the slot after OPEN_SECONDS
+                if self.probe_started is None or now - self.probe_started >= OPEN_SECONDS:
+                    self.probe_started = now
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if success:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if (
+                self.state == CLOSED
+                and len(self.outcomes) >= MIN_CALLS
+                and failures / len(self.outcomes) >= FAILURE_RATE
+            ):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started = None
+
+    def status(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, round(OPEN_SECONDS - (time.monotonic() - self.opened_at), 1))
+            return {
+                'state': self.state,
+                'calls': len(self.outcomes),
+                'failures': self.outcomes.count(False),
+                'rejected': self.rejected,
+                'retry_in': retry_in,
+            }
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def endpoint(method, path):
+    """Breaker name for a call: the method plus the path with ids replaced by placeholders."""
+    path = re.sub(r'/by-username/[^/]+$', '/by-username/{username}', path)
+    path = re.sub(r'/\d+(?=/|$)', '/{id}', path)
+    return f"{method} {path}"
+
+
+def breaker_for(method, path):
+    name = endpoint(method, path)
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def status():
+    """State of every breaker created so far, by endpoint name."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.status() for b in sorted(breakers, key=lambda b: b.name)}
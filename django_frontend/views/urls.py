@@ -13,4 +13,6 @@ urlpatterns = [
     path('staff-admin/bookings/', views.admin_bookings, name='admin_bookings'),
     path('staff-admin/users/', views.admin_users, name='admin_users'),
     path('staff-admin/settings/', views.admin_settings, name='admin_settings'),
+    path('staff-admin/cache/invalidate/', views.invalidate_api_cache, name='invalidate_api_cache'),
+    path('api-status/', views.api_status, name='api_status'),
 ]
@@ -1,10 +1,40 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 from functools import wraps
 import os
 import requests
+from . import api_client, circuit_breaker
 import json
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
+
+
+# Seconds an admin-membership answer is reused; also how long a user removed
+# from the API keeps (or a newly added one lacks) admin access
+ADMIN_MEMBERSHIP_TTL = int(os.environ.get('ADMIN_MEMBERSHIP_TTL', '30'))
+# Bookings listed per page of the admin bookings table
+ADMIN_BOOKINGS_PAGE_SIZE = 100
+
+
+def is_admin(username):
+    """Whether ``username`` is an API user, cached for ADMIN_MEMBERSHIP_TTL seconds.
+
+    Looked up with the API's indexed /api/users/by-username/ route, so the
+    check costs the same however many users exist. Failed lookups are not
+    cached.
+    """
+    key = f"admin-member:{username.lower()}"
+    member = cache.get(key)
+    if member is None:
+        resp = api_client.get(f"/api/users/by-username/{quote(username, safe='')}", params={'fields': 'id'}, timeout=3)
+        if resp.status_code not in (200, 404):
+            return False
+        member = resp.status_code == 200
+        cache.set(key, member, ADMIN_MEMBERSHIP_TTL)
+    return member
 
 
 def admin_required(view_func):
@@ -16,14 +46,9 @@ def admin_required(view_func):
             return redirect(f'/login/?next={request.path}')
         
         # Check if user is in admin_users list from FastAPI
-        api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
         try:
-            resp = requests.get(f"{api_base}/api/users", timeout=3)
-            if resp.status_code == 200:
-                admin_users = resp.json()
-                admin_usernames = [u.get('username', '').lower() for u in admin_users]
-                if request.user.username.lower() in admin_usernames:
-                    return view_func(request, *args, **kwargs)
+            if is_admin(request.user.username):
+                return view_func(request, *args, **kwargs)
         except Exception:
             pass
         
@@ -34,39 +59,19 @@ def admin_required(view_func):
 
 
 def index(request):
-    # Try to fetch products from FastAPI service (server-side)
-    products = []
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
+    # Products and the rooms preview are fetched from FastAPI side by side
     # Note: FastAPI routers are mounted under /api
-    try:
-        resp = requests.get(f"{api_base}/api/products", timeout=3)
-        if resp.status_code == 200:
-            products = resp.json()
-    except Exception:
-        products = []
-
-    # try to fetch rooms from API for homepage preview
-    rooms_preview = []
-    try:
-        resp = requests.get(f"{api_base}/api/rooms", timeout=3)
-        if resp.status_code == 200:
-            rooms_preview = resp.json()[:3]
-    except Exception:
-        pass
+    data = api_client.fetch_all({
+        "products": "/api/products",
+        "rooms": ("/api/rooms/", {'limit': 3, 'fields': 'title,price,image_url,description'}),
+    }, timeout=3)
+    products = data["products"] or []
+    rooms_preview = (data["rooms"] or [])[:3]
 
     return render(request, 'index.html', {"rooms": rooms_preview, "testimonials": [], "products": products})
 
 def rooms(request):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
-    rooms_list = []
-    try:
-        resp = requests.get(f"{api_base}/api/rooms", timeout=3)
-        if resp.status_code == 200:
-            rooms_list = resp.json()
-    except Exception:
-        pass
-    
-    # Apply filters from GET parameters
+    # Read filters from GET parameters
     min_price = request.GET.get('min_price', '0')
     max_price = request.GET.get('max_price', '1000')
     capacity = request.GET.get('capacity', '')
@@ -78,21 +83,25 @@ def rooms(request):
     except (ValueError, TypeError):
         min_price = 0
         max_price = 1000
-    
-    # Filter by price
-    filtered_rooms = [r for r in rooms_list if min_price <= float(r.get('price', 0)) <= max_price]
-    
-    # Filter by capacity
+
+    params = {'min_price': min_price, 'max_price': max_price}
     if capacity:
         try:
             capacity = int(capacity)
-            filtered_rooms = [r for r in filtered_rooms if int(r.get('capacity', 0)) >= capacity]
+            params['min_capacity'] = capacity
         except (ValueError, TypeError):
             pass
-    
-    # Filter by amenities - for now use type as amenity indicator
     if amenities_param:
-        filtered_rooms = [r for r in filtered_rooms if any(amenity.lower() in str(r).lower() for amenity in amenities_param)]
+        params['amenities'] = amenities_param
+
+    # Filtering happens in the API so only matching rooms are transferred
+    filtered_rooms = []
+    try:
+        data = api_client.fetch_json("/api/rooms/search", params=params, timeout=3)
+        if data is not None:
+            filtered_rooms = data
+    except Exception:
+        pass
     
     return render(request, 'rooms.html', {
         "rooms": filtered_rooms,
@@ -103,27 +112,23 @@ def rooms(request):
     })
 
 def room_details(request, room_id):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
     room = None
     try:
-        resp = requests.get(f"{api_base}/api/rooms/{room_id}", timeout=3)
-        if resp.status_code == 200:
-            room = resp.json()
+        room = api_client.fetch_json(f"/api/rooms/{room_id}", timeout=3)
     except Exception:
         pass
     return render(request, 'room_details.html', {"room": room})
 
 def booking(request):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
     rooms_list = []
     booking_success = False
     booking_error = None
     selected_room_id = None
     
     try:
-        resp = requests.get(f"{api_base}/api/rooms", timeout=3)
-        if resp.status_code == 200:
-            rooms_list = resp.json()
+        data = api_client.fetch_pages("/api/rooms/", timeout=3)
+        if data is not None:
+            rooms_list = data
     except Exception:
         pass
     
@@ -149,16 +154,13 @@ def booking(request):
             if not all([first_name, last_name, email, room_id, checkin, checkout]):
                 booking_error = "Please fill in all required fields."
             else:
-                # Get room details for pricing
-                room_name = ""
-                room_price = 0
-                for room in rooms_list:
-                    if str(room.get('id')) == room_id:
-                        room_name = room.get('title', '')
-                        room_price = float(room.get('price', 0))
-                        break
+                # Get room details for pricing; uncached, so the guest is
+                # charged the current price rather than a stale copy
+                room = None
+                if room_id.isdigit():
+                    room = api_client.fetch_json(f"/api/rooms/{room_id}", params={'fields': 'price'}, timeout=3, cached=False)
                 
-                if not room_name:
+                if not room:
                     booking_error = "Selected room not found."
                 else:
                     # Calculate total from dates
@@ -169,12 +171,12 @@ def booking(request):
                     if nights <= 0:
                         booking_error = "Checkout date must be after check-in date."
                     else:
-                        total = float(room_price * nights)
+                        total = float(room.get('price', 0) * nights)
                         
                         # Create booking via FastAPI - match BookingSchema fields
                         booking_data = {
                             "guest_name": f"{first_name} {last_name}",
-                            "room": room_name,
+                            "room_id": int(room_id),
                             "checkin": checkin,
                             "checkout": checkout,
                             "nights": int(nights),
@@ -183,9 +185,11 @@ def booking(request):
                         }
                         
                         try:
-                            post_resp = requests.post(f"{api_base}/api/bookings", json=booking_data, timeout=5)
+                            post_resp = api_client.post("/api/bookings/", json=booking_data, timeout=5)
                             if post_resp.status_code in [200, 201]:
                                 booking_success = True
+                            elif post_resp.status_code == 409:
+                                booking_error = "This room is already booked for the selected dates. Please choose different dates."
                             else:
                                 booking_error = f"Booking service error (HTTP {post_resp.status_code}). Please try again."
                         except requests.exceptions.ConnectionError:
@@ -206,51 +210,32 @@ def booking(request):
 
 @admin_required
 def admin_dashboard(request):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
-    rooms_list = []
-    bookings_list = []
-    try:
-        r = requests.get(f"{api_base}/api/rooms", timeout=3)
-        if r.status_code == 200:
-            rooms_list = r.json()
-    except Exception:
-        pass
-    try:
-        b = requests.get(f"{api_base}/api/bookings", timeout=3)
-        if b.status_code == 200:
-            bookings_list = b.json()
-    except Exception:
-        pass
+    today = date.today()
+    # The three calls are independent, so the page waits only for the slowest.
+    # Totals and monthly series are aggregated by the API in a single query;
+    # the room count and tonight's occupancy come from the API's nightly
+    # occupancy calendar
+    data = api_client.fetch_all({
+        "stats": ("/api/bookings/stats", {'months': 6}),
+        "recent": ("/api/bookings/", {'order': 'desc', 'limit': 10}),
+        "occupancy": ("/api/rooms/occupancy", {'start': today.isoformat(), 'end': (today + timedelta(days=1)).isoformat()}),
+    }, timeout=3)
+    stats = data["stats"] or {}
+    recent_bookings = data["recent"] or []
+    occupancy = data["occupancy"] or {}
 
-    total_rooms = len(rooms_list)
-    occupied_rooms = len([r for r in rooms_list if r.get("status") == "Occupied" or r.get("status") == "occupied" or r.get("status") == "Booked"])
+    total_rooms = occupancy.get("rooms", 0)
+    occupied_rooms = occupancy.get("occupied_nights", 0)
     occupancy_rate = int((occupied_rooms / total_rooms * 100)) if total_rooms > 0 else 0
 
-    total_bookings = len(bookings_list)
-    pending_bookings = len([b for b in bookings_list if b.get("status") == "Pending"])
-    total_revenue = sum([b.get("total", 0) for b in bookings_list])
-    
-    # Calculate monthly bookings (simulate based on booking count - you can enhance this with date-based logic)
-    # For now, distribute bookings across 6 months
-    monthly_bookings = []
-    if total_bookings > 0:
-        per_month = max(1, total_bookings // 6)
-        remainder = total_bookings % 6
-        for i in range(6):
-            count = per_month + (1 if i < remainder else 0)
-            monthly_bookings.append(int(count * 8 + (i * 3)))  # Add variation
-    else:
-        monthly_bookings = [0, 0, 0, 0, 0, 0]
-    
-    # Calculate revenue trend (distribute total revenue across months)
-    revenue_trend = []
-    if total_revenue > 0:
-        base_revenue = total_revenue / 6
-        for i in range(6):
-            trend_value = base_revenue * (0.8 + (i * 0.15))  # Upward trend
-            revenue_trend.append(int(trend_value))
-    else:
-        revenue_trend = [0, 0, 0, 0, 0, 0]
+    total_bookings = stats.get("total_bookings", 0)
+    pending_bookings = stats.get("by_status", {}).get("Pending", 0)
+    total_revenue = stats.get("total_revenue", 0)
+
+    monthly = stats.get("monthly", [])
+    month_labels = [datetime.strptime(m["month"], '%Y-%m').strftime('%b') for m in monthly]
+    monthly_bookings = [m["bookings"] for m in monthly] or [0, 0, 0, 0, 0, 0]
+    revenue_trend = [int(m["revenue"]) for m in monthly] or [0, 0, 0, 0, 0, 0]
 
     return render(request, 'admin_dashboard.html', {
         "total_rooms": total_rooms,
@@ -259,19 +244,20 @@ def admin_dashboard(request):
         "total_bookings": total_bookings,
         "pending_bookings": pending_bookings,
         "total_revenue": int(total_revenue),
+        "month_labels": json.dumps(month_labels or ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]),
         "monthly_bookings": monthly_bookings,
         "revenue_trend": revenue_trend,
-        "recent_bookings": bookings_list,
+        "recent_bookings": recent_bookings,
     })
 
 @admin_required
 def admin_rooms(request):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
     rooms_list = []
     try:
-        r = requests.get(f"{api_base}/api/rooms", timeout=3)
-        if r.status_code == 200:
-            rooms_list = r.json()
+        # Uncached so edits made on this page show up on reload
+        data = api_client.fetch_pages("/api/rooms/", params={'fields': 'title,type,price,status'}, timeout=3, cached=False)
+        if data is not None:
+            rooms_list = data
     except Exception:
         pass
     total_rooms = len(rooms_list)
@@ -283,52 +269,64 @@ def admin_rooms(request):
         "total_rooms": total_rooms,
         "occupied_rooms": occupied_rooms,
         "available_rooms": available_rooms,
-        "fastapi_url": api_base,
+        "fastapi_url": api_client.API_BASE,
     })
 
 @admin_required
 def admin_bookings(request):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
-    bookings_list = []
-    try:
-        r = requests.get(f"{api_base}/api/bookings", timeout=3)
-        if r.status_code == 200:
-            bookings_list = r.json()
-    except Exception:
-        pass
-    
-    # Calculate stats from bookings
-    total_bookings = len(bookings_list)
-    confirmed_bookings = len([b for b in bookings_list if b.get("status") == "Confirmed"])
-    pending_bookings = len([b for b in bookings_list if b.get("status") == "Pending"])
-    total_revenue = sum([b.get("total", 0) for b in bookings_list])
+    # Newest first, one page at a time; ?after=<id> continues with older ones
+    page = {'order': 'desc', 'limit': ADMIN_BOOKINGS_PAGE_SIZE}
+    after = request.GET.get('after', '')
+    if after.isdigit():
+        page['after'] = after
+    data = api_client.fetch_all({"bookings": ("/api/bookings/", page), "stats": "/api/bookings/stats"}, timeout=3)
+    bookings_list = data["bookings"] or []
+    stats = data["stats"] or {}
+    older_after = bookings_list[-1]["id"] if len(bookings_list) == ADMIN_BOOKINGS_PAGE_SIZE else None
+
+    # Stats cover every booking, not just the page listed above
+    by_status = stats.get("by_status", {})
+    total_bookings = stats.get("total_bookings", 0)
+    confirmed_bookings = by_status.get("Confirmed", 0)
+    pending_bookings = by_status.get("Pending", 0)
+    total_revenue = stats.get("total_revenue", 0)
     
     return render(request, 'admin_booking.html', {
         "bookings": bookings_list,
         "total_bookings": total_bookings,
         "confirmed_bookings": confirmed_bookings,
         "pending_bookings": pending_bookings,
-        "total_revenue": total_revenue
+        "total_revenue": total_revenue,
+        "older_after": older_after,
+        "is_first_page": 'after' not in page,
     })
 
 @admin_required
 def admin_users(request):
-    api_base = os.environ.get('FASTAPI_URL', 'http://127.0.0.1:8001')
     users_list = []
     try:
-        r = requests.get(f"{api_base}/api/users", timeout=3)
-        if r.status_code == 200:
-            users_list = r.json()
+        users_list = api_client.fetch_pages("/api/users/", timeout=3) or []
     except Exception:
         pass
     total_users = len(users_list)
     return render(request, 'admin_users.html', {
         "users": users_list,
         "total_users": total_users,
-        "fastapi_url": api_base
+        "fastapi_url": api_client.API_BASE
     })
 
 
+@admin_required
+@require_POST
+def invalidate_api_cache(request):
+    """Drop a group of cached API responses; called by the admin pages after writes."""
+    group = request.POST.get('group', '')
+    if group not in {g for _, g, _ in api_client.CACHED_ENDPOINTS}:
+        return JsonResponse({'detail': f'Unknown cache group: {group}'}, status=400)
+    api_client.invalidate(group)
+    return JsonResponse({'invalidated': group})
+
+
 @admin_required
 def admin_settings(request):
     """Simple admin settings page that reads/writes a JSON file in the app folder."""
@@ -386,6 +384,17 @@ def admin_settings(request):
     })
 
 
+@admin_required
+def api_status(request):
+    """Circuit breaker state per FastAPI endpoint, for monitoring the frontend's view of the API.
+
+    Admin-only, as it reveals the API's address and which endpoints fail.
+    The admin check itself calls the API, so while the users endpoint is
+    down only admins whose membership is still cached get through.
+    """
+    return JsonResponse({'api_base': api_client.API_BASE, 'endpoints': circuit_breaker.status()})
+
+
 def login_view(request):
     """Custom login view for admin area."""
     from django.contrib.auth import authenticate, login as auth_login
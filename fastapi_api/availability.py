@@ -0,0 +1,99 @@
+from sqlalchemy import bindparam, exists, or_, select
+
+import database
+
+# Bookings in these states no longer hold their room
+INACTIVE_BOOKING_STATUSES = ("Cancelled", "Canceled", "cancelled", "canceled")
+
+
+def overlapping_bookings(room_id, checkin, checkout):
+    """WHERE clause for active bookings of room ``room_id`` whose stay overlaps [checkin, checkout).
+
+    ``room_id`` may be a value or a correlated column such as
+    ``RoomModel.id``. The predicate matches ``ix_bookings_room_id_stay``: an
+    equality on room_id followed by a range on checkout_date.
+    """
+    booking = database.BookingModel
+    return (
+        (booking.room_id == room_id)
+        & (booking.checkout_date > checkin)
+        & (booking.checkin_date < checkout)
+        & or_(booking.status.is_(None), booking.status.not_in(INACTIVE_BOOKING_STATUSES))
+    )
+
+
+def _available_rooms_stmt(with_guests):
+    room = database.RoomModel
+    booked = exists().where(overlapping_bookings(room.id, bindparam("checkin"), bindparam("checkout")))
+    stmt = select(*room.__table__.columns).where(~booked)
+    if with_guests:
+        stmt = stmt.where(room.capacity >= bindparam("guests"))
+    return stmt.order_by(room.id)
+
+
+# Built once with bind parameters so each request skips statement construction
+_AVAILABLE_ROOMS = _available_rooms_stmt(with_guests=False)
+_AVAILABLE_ROOMS_FOR_GUESTS = _available_rooms_stmt(with_guests=True)
+
+
+def available_rooms_query(checkin, checkout, guests=None):
+    """Rooms with no overlapping active booking, as a single anti-join select.
+
+    Returns the statement and its parameters for ``session.execute``.
+    """
+    params = {"checkin": checkin, "checkout": checkout}
+    if guests is None:
+        return _AVAILABLE_ROOMS, params
+    params["guests"] = guests
+    return _AVAILABLE_ROOMS_FOR_GUESTS, params
+
+
+async def has_conflict(session, room_id, checkin, checkout, exclude_id=None):
+    """True if another active booking already holds room ``room_id`` for any night of the stay."""
+    if room_id is None or checkin is None or checkout is None:
+        return False
+    stmt = select(database.BookingModel.id).where(overlapping_bookings(room_id, checkin, checkout))
+    if exclude_id is not None:
+        stmt = stmt.where(database.BookingModel.id != exclude_id)
+    res = await session.execute(stmt.limit(1))
+    return res.first() is not None
+
+
+async def held_stays(session, rows, exclude_ids=()):
+    """Active stays that could clash with any of ``rows``, grouped by room, from one query.
+
+    ``rows`` are booking column dicts. Bookings in ``exclude_ids`` (being
+    updated or deleted alongside) are left out. Pair with ``claim_stay``.
+    """
+    wanted = [
+        row for row in rows
+        if row["status"] not in INACTIVE_BOOKING_STATUSES
+        and row["room_id"] is not None and row["checkin_date"] and row["checkout_date"]
+    ]
+    held = {}
+    if not wanted:
+        return held
+    booking = database.BookingModel
+    res = await session.execute(
+        select(booking.id, booking.room_id, booking.checkin_date, booking.checkout_date).where(
+            booking.room_id.in_({row["room_id"] for row in wanted}),
+            booking.checkout_date > min(row["checkin_date"] for row in wanted),
+            booking.checkin_date < max(row["checkout_date"] for row in wanted),
+            or_(booking.status.is_(None), booking.status.not_in(INACTIVE_BOOKING_STATUSES)),
+        )
+    )
+    for row in res.all():
+        if row.id not in exclude_ids:
+            held.setdefault(row.room_id, []).append((row.checkin_date, row.checkout_date))
+    return held
+
+
+def claim_stay(held, row):
+    """Add the row's stay to ``held`` unless it overlaps one already there; False on overlap."""
+    if row["status"] in INACTIVE_BOOKING_STATUSES or row["room_id"] is None or not (row["checkin_date"] and row["checkout_date"]):
+        return True
+    stays = held.setdefault(row["room_id"], [])
+    if any(row["checkin_date"] < out and start < row["checkout_date"] for start, out in stays):
+        return False
+    stays.append((row["checkin_date"], row["checkout_date"]))
+    return True
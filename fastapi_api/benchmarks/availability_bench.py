@@ -0,0 +1,123 @@
+"""Benchmark the /api/rooms/available overlap query.
+
+Seeds a throwaway SQLite database with synthetic rooms and bookings, then
+times the same single anti-join statement the endpoint runs.
+
+Usage (from fastapi_api/):
+    python benchmarks/availability_bench.py --bookings 1000000 --rooms 200
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+import database  # noqa: E402
+from availability import available_rooms_query  # noqa: E402
+
+
+def seed(path, n_rooms, n_bookings, start, batch=50_000):
+    """Write rooms and back-to-back stays per room, oldest first.
+
+    Returns the earliest date by which every room's history has ended.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(database.RoomModel), [
+            {"title": f"Room {i}", "price": 50.0 + i, "type": "Standard", "capacity": 1 + i % 4}
+            for i in range(n_rooms)
+        ])
+        per_room = n_bookings // n_rooms
+        history_end = None
+        rows = []
+        for i in range(n_rooms):
+            day = start
+            for _ in range(per_room):
+                nights = rng.randint(1, 5)
+                checkout = day + timedelta(days=nights)
+                rows.append({
+                    "guest_name": "Guest", "room": f"Room {i}", "room_id": i + 1,
+                    "checkin": day.isoformat(), "checkout": checkout.isoformat(),
+                    "checkin_date": day, "checkout_date": checkout,
+                    "status": "Confirmed", "nights": nights, "total": 100.0 * nights,
+                })
+                day = checkout + timedelta(days=rng.randint(0, 2))
+                if len(rows) >= batch:
+                    conn.execute(insert(database.BookingModel), rows)
+                    rows = []
+            history_end = day if history_end is None else min(history_end, day)
+        if rows:
+            conn.execute(insert(database.BookingModel), rows)
+    engine.dispose()
+    return history_end
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{label:<8} p50={statistics.median(samples) * 1000:.3f}ms p99={p99 * 1000:.3f}ms")
+
+
+def bench_sync(path, windows):
+    engine = create_engine(f"sqlite:///{path}")
+    samples = []
+    with engine.connect() as conn:
+        for checkin, checkout in windows:
+            t0 = time.perf_counter()
+            conn.execute(*available_rooms_query(checkin, checkout, 2)).all()
+            samples.append(time.perf_counter() - t0)
+    engine.dispose()
+    return samples
+
+
+async def bench_async(path, windows):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    samples = []
+    async with engine.connect() as conn:
+        for checkin, checkout in windows:
+            t0 = time.perf_counter()
+            (await conn.execute(*available_rooms_query(checkin, checkout, 2))).all()
+            samples.append(time.perf_counter() - t0)
+    await engine.dispose()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    start = date(2000, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        t0 = time.perf_counter()
+        history_end = seed(path, args.rooms, args.bookings, start)
+        print(f"seeded {args.bookings} bookings over {args.rooms} rooms in {time.perf_counter() - t0:.1f}s")
+
+        # Guests search upcoming dates, which overlap the newest stays
+        rng = random.Random(7)
+        windows = []
+        for _ in range(args.queries):
+            checkin = history_end - timedelta(days=rng.randint(0, 60))
+            windows.append((checkin, checkin + timedelta(days=rng.randint(1, 7))))
+
+        report("sql", bench_sync(path, windows))
+        report("async", asyncio.run(bench_async(path, windows)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compare per-request commits with group commit for bursts of POST /api/bookings/.
+
+Drives the app in-process through httpx's ASGI transport (requires httpx)
+against a throwaway SQLite file, once with BOOKING_WRITE_BATCHING off and
+once with it on, and prints throughput and latency percentiles.
+
+Usage (from fastapi_api/):
+    python benchmarks/booking_burst_bench.py --clients 64 --requests 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory(dir=os.environ.get("BENCH_DIR"))
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp.name}/burst.db"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+import write_batcher  # noqa: E402
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def burst(client, label, clients, per_client):
+    latencies = []
+    errors = 0
+
+    async def guest(n):
+        nonlocal errors
+        for k in range(per_client):
+            checkin = date(2030, 1, 1) + timedelta(days=2 * k)
+            payload = {
+                "guest_name": f"Guest {n}",
+                "room": f"{label} room {n}",
+                "checkin": checkin.isoformat(),
+                "checkout": (checkin + timedelta(days=1)).isoformat(),
+                "status": "Pending",
+                "nights": 1,
+                "total": 100.0,
+            }
+            t0 = time.perf_counter()
+            try:
+                resp = await client.post("/api/bookings/", json=payload)
+                ok = resp.status_code == 200
+            except Exception:
+                ok = False  # e.g. "database is locked" raised through the transport
+            latencies.append(time.perf_counter() - t0)
+            errors += not ok
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[guest(n) for n in range(clients)])
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    print(
+        f"{label:<10} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50={statistics.median(latencies) * 1000:.1f}ms  "
+        f"p95={percentile(latencies, 95) * 1000:.1f}ms  "
+        f"p99={percentile(latencies, 99) * 1000:.1f}ms  "
+        f"errors={errors}"
+    )
+
+
+async def run(args):
+    await database.init_db()
+    async with database.AsyncSessionLocal() as session:
+        await session.execute(insert(database.RoomModel), [
+            {"title": f"{label} room {n}", "price": 100.0}
+            for label in ("per-commit", "batched")
+            for n in range(args.clients)
+        ])
+        await session.commit()
+    write_batcher.batcher.max_items = args.max_items
+    write_batcher.batcher.max_delay = args.max_delay_ms / 1000
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        write_batcher.ENABLED = False
+        await burst(client, "per-commit", args.clients, args.requests)
+        write_batcher.ENABLED = True
+        await burst(client, "batched", args.clients, args.requests)
+        await write_batcher.batcher.drain()
+    await database.engine.dispose()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=20, help="bookings per client")
+    parser.add_argument("--max-items", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    finally:
+        _tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main_cli()
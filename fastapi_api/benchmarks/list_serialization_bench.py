@@ -0,0 +1,126 @@
+"""Compare the ORM + response_model list path with the column-tuple fast path.
+
+Seeds a throwaway SQLite database with synthetic bookings and, for each row
+count, checks that both ways of turning a SELECT into a JSON response body
+produce the same bytes, then times them:
+
+* orm:  ORM booking and room entities -> BookingSchema per row ->
+        response_model validation and serialization -> JSONResponse
+        (what the list handlers used to do)
+* fast: Core column tuples (bookings joined to their room, as the list
+        endpoint reads them) -> fast_json.rows_response (orjson when installed)
+
+Usage (from fastapi_api/):
+    python benchmarks/list_serialization_bench.py --rows 10000 100000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Response  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+import database  # noqa: E402
+import fast_json  # noqa: E402
+from routers.bookings import BOOKING_COLUMNS, BookingSchema, booking_select  # noqa: E402
+
+_RESPONSE_MODEL = TypeAdapter(List[BookingSchema])
+
+
+def seed(path, n_rows, batch=50_000):
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(database.RoomModel), [
+            {"title": f"Room {i}", "price": 100.0, "type": "Standard", "capacity": 2} for i in range(200)
+        ])
+        for start in range(0, n_rows, batch):
+            conn.execute(insert(database.BookingModel), [
+                {
+                    "guest_name": f"Guest {i}", "room": f"Room {i % 200}", "room_id": i % 200 + 1,
+                    "checkin": "2030-01-01", "checkout": "2030-01-03",
+                    "checkin_date": date(2030, 1, 1), "checkout_date": date(2030, 1, 3),
+                    "status": "Confirmed", "nights": 2, "total": 200.0,
+                }
+                for i in range(start, min(start + batch, n_rows))
+            ])
+    engine.dispose()
+
+
+async def orm_path(session, limit):
+    booking, room = database.BookingModel, database.RoomModel
+    res = await session.execute(
+        select(booking, room).outerjoin(room, room.id == booking.room_id).order_by(booking.id).limit(limit)
+    )
+    items = [
+        BookingSchema(
+            id=b.id, guest_name=b.guest_name, room=r.title if r else b.room, room_id=b.room_id,
+            checkin=b.checkin_date, checkout=b.checkout_date, status=b.status, nights=b.nights, total=b.total,
+            room_type=r.type if r else None, room_price=r.price if r else None, room_image_url=r.image_url if r else None,
+        )
+        for b, r in res.all()
+    ]
+    validated = _RESPONSE_MODEL.validate_python(items)
+    return JSONResponse(_RESPONSE_MODEL.dump_python(validated, mode="json")).body
+
+
+async def fast_path(session, limit):
+    res = await session.execute(booking_select(BOOKING_COLUMNS).order_by(database.BookingModel.id).limit(limit))
+    return fast_json.rows_response(res.keys(), res.all(), Response()).body
+
+
+async def best_of(fn, session, limit, repeats):
+    best = None
+    for _ in range(repeats):
+        session.expunge_all()
+        t0 = time.perf_counter()
+        body = await fn(session, limit)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+async def run(path, counts, repeats):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    async with Session() as session:
+        for n in counts:
+            # Only worth timing while both paths answer with the same body
+            session.expunge_all()
+            if await orm_path(session, n) != await fast_path(session, n):
+                raise SystemExit(f"orm and fast bodies differ for {n} rows")
+            orm_t, orm_bytes = await best_of(orm_path, session, n, repeats)
+            fast_t, fast_bytes = await best_of(fast_path, session, n, repeats)
+            print(
+                f"{n:>8} rows  orm={n / orm_t:>10,.0f} rows/s  fast={n / fast_t:>10,.0f} rows/s  "
+                f"speedup={orm_t / fast_t:.1f}x  body={fast_bytes} bytes (orm {orm_bytes})"
+            )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if fast_json.orjson is not None else 'json (stdlib)'}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, max(args.rows))
+        asyncio.run(run(path, args.rows, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""In-process load test and regression check for the API.
+
+Seeds a throwaway SQLite database with synthetic rooms, users and bookings,
+then drives main.app through httpx's ASGI transport (requires httpx; no
+sockets or server process) with concurrent clients running each scenario:
+
+    catalog     room list pages, search and room detail, as a browsing guest
+    available   /api/rooms/available over random stay windows
+    booking     bursts of POST /api/bookings/ for free, non-overlapping stays
+    dashboard   the three requests behind the admin dashboard, as one operation
+
+Prints throughput and p50/p95/p99 latency per scenario and can write them as
+JSON. Given a baseline from an earlier run (--save-baseline), exits non-zero
+when any scenario lost more than --tolerance of its throughput, grew its p95
+by more than --tolerance, or failed more requests. Baselines are only
+comparable on the same machine and scale.
+
+Usage (from fastapi_api/):
+    python benchmarks/load_suite.py --save-baseline /tmp/baseline.json
+    python benchmarks/load_suite.py --baseline /tmp/baseline.json --output results.json
+    python benchmarks/load_suite.py --scenarios catalog available --rooms 500 --bookings 200000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory(dir=os.environ.get("BENCH_DIR"))
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp.name}/load.db"
+
+import httpx  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+
+HISTORY_START = date(2024, 1, 1)
+ROOM_TYPES = ("Standard", "Deluxe", "Suite", "Family")
+STATUSES = ("Confirmed", "Confirmed", "Confirmed", "Pending", "Completed", "Cancelled")
+
+
+def seed(path, n_rooms, n_users, n_bookings, batch=50_000):
+    """Write rooms, users and back-to-back stays per room from HISTORY_START.
+
+    Returns the day after the last seeded checkout, where new bookings are free.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        conn.execute(insert(database.RoomModel), [
+            {
+                "title": f"Room {i}", "price": 50.0 + 5 * (i % 40), "type": ROOM_TYPES[i % len(ROOM_TYPES)],
+                "capacity": 1 + i % 4, "status": "Available",
+                "description": "Sea view, breakfast" if i % 3 == 0 else "City view, wifi",
+            }
+            for i in range(n_rooms)
+        ])
+        conn.execute(insert(database.UserModel), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "full_name": f"User {i}"}
+            for i in range(n_users)
+        ])
+        per_room = n_bookings // max(n_rooms, 1)
+        free_from = HISTORY_START
+        rows = []
+        for i in range(n_rooms):
+            day = HISTORY_START
+            for _ in range(per_room):
+                nights = rng.randint(1, 5)
+                checkout = day + timedelta(days=nights)
+                rows.append({
+                    "guest_name": f"Guest {rng.randrange(n_users or 1)}", "room": f"Room {i}", "room_id": i + 1,
+                    "checkin": day.isoformat(), "checkout": checkout.isoformat(),
+                    "checkin_date": day, "checkout_date": checkout,
+                    "status": rng.choice(STATUSES), "nights": nights, "total": 100.0 * nights,
+                })
+                day = checkout + timedelta(days=rng.randint(0, 2))
+                if len(rows) >= batch:
+                    conn.execute(insert(database.BookingModel), rows)
+                    rows = []
+            free_from = max(free_from, day)
+        if rows:
+            conn.execute(insert(database.BookingModel), rows)
+    engine.dispose()
+    return free_from + timedelta(days=1)
+
+
+def expect(resp):
+    if resp.status_code != 200:
+        raise RuntimeError(f"{resp.request.method} {resp.request.url.path} -> {resp.status_code}")
+
+
+class Scenarios:
+    """One method per scenario; each call performs one measured operation."""
+
+    def __init__(self, client, n_rooms, free_from, history_end):
+        self.client = client
+        self.n_rooms = n_rooms
+        self.free_from = free_from
+        self.history_days = max((history_end - HISTORY_START).days, 1)
+
+    async def catalog(self, i, rng):
+        kind = i % 3
+        if kind == 0:
+            expect(await self.client.get("/api/rooms/", params={"limit": 20, "after": rng.randrange(self.n_rooms)}))
+        elif kind == 1:
+            expect(await self.client.get("/api/rooms/search", params={
+                "type": rng.choice(ROOM_TYPES), "min_capacity": rng.randint(1, 3), "max_price": 200, "limit": 20,
+            }))
+        else:
+            expect(await self.client.get(f"/api/rooms/{rng.randint(1, self.n_rooms)}"))
+
+    async def available(self, i, rng):
+        checkin = HISTORY_START + timedelta(days=rng.randrange(self.history_days))
+        checkout = checkin + timedelta(days=rng.randint(1, 7))
+        expect(await self.client.get("/api/rooms/available", params={
+            "checkin": checkin.isoformat(), "checkout": checkout.isoformat(),
+        }))
+
+    async def booking(self, i, rng):
+        # Operation i books room (i mod rooms) for a night nobody else holds
+        room_id = i % self.n_rooms + 1
+        checkin = self.free_from + timedelta(days=2 * (i // self.n_rooms))
+        expect(await self.client.post("/api/bookings/", json={
+            "guest_name": f"Load guest {i}", "room_id": room_id,
+            "checkin": checkin.isoformat(), "checkout": (checkin + timedelta(days=1)).isoformat(),
+            "status": "Pending", "nights": 1, "total": 100.0,
+        }))
+
+    async def dashboard(self, i, rng):
+        today = HISTORY_START + timedelta(days=rng.randrange(self.history_days))
+        responses = await asyncio.gather(
+            self.client.get("/api/bookings/stats", params={"months": 6}),
+            self.client.get("/api/bookings/", params={"order": "desc", "limit": 10}),
+            self.client.get("/api/rooms/occupancy", params={
+                "start": today.isoformat(), "end": (today + timedelta(days=1)).isoformat(),
+            }),
+        )
+        for resp in responses:
+            expect(resp)
+
+
+SCENARIOS = ("catalog", "available", "booking", "dashboard")
+
+
+def percentile(samples, pct):
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def run_scenario(operation, n_ops, concurrency, warmup):
+    """Run ``n_ops`` operations across ``concurrency`` clients; returns the summary dict."""
+    rng = random.Random(7)
+    for i in range(warmup):
+        await operation(n_ops + i, rng)
+
+    latencies = []
+    errors = 0
+    next_op = 0
+
+    async def client_loop():
+        nonlocal errors, next_op
+        while next_op < n_ops:
+            i = next_op
+            next_op += 1
+            t0 = time.perf_counter()
+            try:
+                await operation(i, rng)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "operations": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print each scenario against the baseline; returns the regressed scenario names."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<10} no baseline")
+            continue
+        throughput = current["throughput"] / base["throughput"] - 1
+        p95 = current["p95_ms"] / base["p95_ms"] - 1
+        failed = (
+            throughput < -tolerance
+            or p95 > tolerance
+            or current["errors"] > base["errors"]
+        )
+        print(
+            f"{name:<10} throughput {throughput:+7.1%}  p95 {p95:+7.1%}  "
+            f"errors {base['errors']} -> {current['errors']}  {'REGRESSION' if failed else 'ok'}"
+        )
+        if failed:
+            regressions.append(name)
+    return regressions
+
+
+async def run(args, free_from, history_end):
+    # Slow-query and budget warnings would flood the report under load
+    logging.getLogger("staycation.sql").setLevel(logging.ERROR)
+    await main.on_startup()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        scenarios = Scenarios(client, args.rooms, free_from, history_end)
+        results = {}
+        for name in args.scenarios:
+            concurrency = args.concurrency or (32 if name == "booking" else 8)
+            results[name] = summary = await run_scenario(getattr(scenarios, name), args.requests, concurrency, args.warmup)
+            print(
+                f"{name:<10} {summary['throughput']:8.1f} ops/s  "
+                f"p50={summary['p50_ms']:.1f}ms  p95={summary['p95_ms']:.1f}ms  p99={summary['p99_ms']:.1f}ms  "
+                f"errors={summary['errors']}"
+            )
+    await main.on_shutdown()
+    await database.engine.dispose()
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=500, help="measured operations per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured operations per scenario")
+    parser.add_argument("--concurrency", type=int, default=None, help="clients per scenario (default 8, 32 for booking)")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against results saved by --save-baseline")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline to this path")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative throughput loss / p95 growth")
+    args = parser.parse_args()
+
+    config = {k: getattr(args, k) for k in ("rooms", "users", "bookings", "requests", "concurrency")}
+    try:
+        free_from = seed(f"{_tmp.name}/load.db", args.rooms, args.users, args.bookings)
+        results = asyncio.run(run(args, free_from, free_from - timedelta(days=1)))
+    finally:
+        _tmp.cleanup()
+
+    report = {"config": config, "results": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"warning: baseline was recorded with {baseline.get('config')}, this run used {config}", file=sys.stderr)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"performance regressed in: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,88 @@
+"""Measure API startup: importing main plus running database.init_db.
+
+Each sample runs in a fresh interpreter so module imports are cold, against a
+throwaway SQLite file (optionally pre-filled with bookings, to show startup
+does not grow with the data). Exits non-zero when the median exceeds
+``--max-ms``, so it can be used as a check in CI. Every sample restarts on
+the database the previous one initialised, so it also fails when init_db
+cannot run against an already-migrated file.
+
+Usage (from fastapi_api/):
+    python benchmarks/startup_bench.py --bookings 200000 --max-ms 1500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+import database  # noqa: E402
+
+# Runs in the child process; prints one JSON line of timings in milliseconds
+_PROBE = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import main, database
+t1 = time.perf_counter()
+asyncio.run(database.init_db())
+t2 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "init_ms": (t2 - t1) * 1000}))
+"""
+
+
+def seed(path, n_bookings, batch=50_000):
+    engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for start in range(0, n_bookings, batch):
+            conn.execute(insert(database.BookingModel), [
+                {"guest_name": "Guest", "room": f"Room {i % 200}", "checkin": "2030-01-01", "checkout": "2030-01-03",
+                 "checkin_date": database.parse_stay_date("2030-01-01"), "checkout_date": database.parse_stay_date("2030-01-03"),
+                 "status": "Confirmed", "nights": 2, "total": 200.0}
+                for i in range(start, min(start + batch, n_bookings))
+            ])
+    engine.dispose()
+
+
+def probe(path):
+    env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{path}")
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=APP_DIR, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        print(f"startup failed on {path}:\n{out.stderr}", file=sys.stderr)
+        sys.exit(1)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookings", type=int, default=0, help="rows to pre-fill before measuring")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail when median import+init exceeds this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "startup.db")
+        if args.bookings:
+            seed(path, args.bookings)
+        probe(path)  # first boot creates the schema; measure steady-state restarts
+        samples = [probe(path) for _ in range(args.runs)]
+
+    imports = statistics.median(s["import_ms"] for s in samples)
+    inits = statistics.median(s["init_ms"] for s in samples)
+    total = statistics.median(s["import_ms"] + s["init_ms"] for s in samples)
+    print(f"bookings={args.bookings} import={imports:.0f}ms init_db={inits:.1f}ms total={total:.0f}ms")
+    if args.max_ms is not None and total > args.max_ms:
+        print(f"startup {total:.0f}ms exceeds the {args.max_ms:.0f}ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
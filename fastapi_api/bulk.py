@@ -0,0 +1,94 @@
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, Field, ValidationError, model_validator
+from sqlalchemy import select
+
+MAX_BULK_ITEMS = 5000
+
+
+class BulkRequest(BaseModel):
+    """Items to create, update (each with an ``id``) and delete in one transaction.
+
+    Items are validated one by one so a bad row is reported in the results
+    instead of rejecting the whole batch.
+    """
+    create: List[Dict[str, Any]] = Field(default_factory=list)
+    update: List[Dict[str, Any]] = Field(default_factory=list)
+    delete: List[int] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def check_size(self):
+        if len(self.create) + len(self.update) + len(self.delete) > MAX_BULK_ITEMS:
+            raise ValueError(f"at most {MAX_BULK_ITEMS} items per request")
+        return self
+
+
+class BulkItemResult(BaseModel):
+    op: str
+    index: int
+    id: int | None = None
+    status: str
+    detail: str | None = None
+
+
+class BulkResponse(BaseModel):
+    created: int
+    updated: int
+    deleted: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+def validate_items(schema, items, op, results):
+    """Validate raw items against ``schema``; failures are appended to ``results``."""
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            # Model-level errors (e.g. a whole stay) have an empty location
+            errors = "; ".join(
+                f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"] for e in exc.errors()
+            )
+            results.append(BulkItemResult(op=op, index=index, status="error", detail=errors))
+    return valid
+
+
+def check_targets(op, indexed_ids, known_ids, claimed, results):
+    """Keep (index, id) pairs whose id exists and is not already used by this batch."""
+    kept = []
+    for index, item_id in indexed_ids:
+        if item_id is None:
+            results.append(BulkItemResult(op=op, index=index, status="error", detail="id is required"))
+        elif item_id not in known_ids:
+            results.append(BulkItemResult(op=op, index=index, id=item_id, status="error", detail="not found"))
+        elif item_id in claimed:
+            results.append(BulkItemResult(op=op, index=index, id=item_id, status="error", detail="id appears more than once in this request"))
+        else:
+            claimed.add(item_id)
+            kept.append((index, item_id))
+    return kept
+
+
+async def existing_ids(session, model, ids):
+    """The subset of ``ids`` present in ``model``'s table, in one query."""
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    res = await session.execute(select(model.id).where(model.id.in_(ids)))
+    return set(res.scalars().all())
+
+
+def summarize(results):
+    order = {"create": 0, "update": 1, "delete": 2}
+    results.sort(key=lambda r: (order[r.op], r.index))
+    counts = {"created": 0, "updated": 0, "deleted": 0, "error": 0}
+    for r in results:
+        counts[r.status] += 1
+    return BulkResponse(
+        created=counts["created"],
+        updated=counts["updated"],
+        deleted=counts["deleted"],
+        failed=counts["error"],
+        results=results,
+    )
@@ -1,7 +1,12 @@
+import asyncio
 import os
-from sqlalchemy import Column, Integer, String, Float, select
+from datetime import date, datetime
+from sqlalchemy import Boolean, Column, Date, ForeignKey, Index, Integer, String, Float, bindparam, event, func, inspect, select, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from typing import AsyncGenerator
 
 # SQLite3 configuration for async operations
@@ -10,19 +15,66 @@ DATABASE_URL = os.environ.get(
     "sqlite+aiosqlite:///./staycation.db"
 )
 
-# Create async engine with SQLite
-engine = create_async_engine(
-    DATABASE_URL,
-    future=True,
-    echo=False  # Set to True for SQL query logging
-)
+# "default" keeps one engine for everything; "production" tunes SQLite for
+# concurrent load with a read-only pool and a single writer connection
+DB_PROFILE = os.environ.get("DB_PROFILE", "default")
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    "cache_size": os.environ.get("SQLITE_CACHE_SIZE", "-65536"),  # negative = KiB
+    "busy_timeout": os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    "temp_store": "MEMORY",
+}
+READ_POOL_SIZE = int(os.environ.get("DB_READ_POOL_SIZE", "8"))
+
+
+def _apply_pragmas(async_engine, read_only=False):
+    """Run SQLITE_PRAGMAS on every new connection of ``async_engine``."""
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
 
-# Create async session factory
+
+if DB_PROFILE == "production":
+    # Writes queue for the one writer connection instead of fighting over the lock
+    engine = create_async_engine(
+        DATABASE_URL, future=True, echo=False,
+        poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0,
+    )
+    read_engine = create_async_engine(
+        DATABASE_URL, future=True, echo=False,
+        poolclass=AsyncAdaptedQueuePool, pool_size=READ_POOL_SIZE, max_overflow=0,
+    )
+    _apply_pragmas(engine)
+    _apply_pragmas(read_engine, read_only=True)
+else:
+    # Create async engine with SQLite
+    engine = create_async_engine(
+        DATABASE_URL,
+        future=True,
+        echo=False  # Set to True for SQL query logging
+    )
+    read_engine = engine
+
+# Create async session factories: writes go through AsyncSessionLocal,
+# GET handlers read through ReadSessionLocal
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
+ReadSessionLocal = async_sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
 
 # Base class for all models
 Base = declarative_base()
@@ -34,14 +86,21 @@ class RoomModel(Base):
     __tablename__ = "rooms"
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String(255), nullable=False)
-    price = Column(Float, nullable=False)
-    type = Column(String(100), nullable=True)
-    capacity = Column(Integer, nullable=True)
+    title = Column(String(255), nullable=False, index=True)
+    price = Column(Float, nullable=False, index=True)
+    type = Column(String(100), nullable=True, index=True)
+    capacity = Column(Integer, nullable=True, index=True)
     image_url = Column(String(1024), nullable=True)
     status = Column(String(50), nullable=True)
     description = Column(String(1024), nullable=True)
 
+    # AUTOINCREMENT keeps SQLite from handing the id of a deleted room to the
+    # next new one, which would inherit any booking still pointing at it. A
+    # rooms table created before this keeps reusing ids (delete_room refuses
+    # rooms with bookings, which covers that case); QUICK_REFERENCE.md shows
+    # how to convert one
+    __table_args__ = {"sqlite_autoincrement": True}
+
 
 # Booking Model - Guest bookings
 class BookingModel(Base):
@@ -49,12 +108,26 @@ class BookingModel(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     guest_name = Column(String(255), nullable=False)
+    # Title of the room when the booking was written; responses show the
+    # room's current title through room_id
     room = Column(String(255), nullable=False)
+    # Indexed by ix_bookings_room_id_stay, which leads with it
+    room_id = Column(Integer, ForeignKey("rooms.id"), nullable=True)
     checkin = Column(String(100), nullable=True)
     checkout = Column(String(100), nullable=True)
     status = Column(String(50), nullable=True)
     nights = Column(Integer, nullable=True)
     total = Column(Float, nullable=True)
+    # Parsed copies of checkin/checkout used for date-range queries
+    checkin_date = Column(Date, nullable=True)
+    checkout_date = Column(Date, nullable=True)
+
+    __table_args__ = (
+        # Checkout follows room_id so "stays ending after X" is a range seek per room
+        Index("ix_bookings_room_id_stay", "room_id", "checkout_date", "checkin_date", "status"),
+        # Covers checkin-date windows and the monthly rollup without touching the table
+        Index("ix_bookings_checkin_rollup", "checkin_date", "status", "total"),
+    )
 
 
 # User Model - System users
@@ -66,20 +139,180 @@ class UserModel(Base):
     email = Column(String(255), nullable=True)
     full_name = Column(String(255), nullable=True)
 
+    __table_args__ = (
+        # Usernames are unique regardless of case; serves lookups on lower(username)
+        Index("ix_users_username_lower", func.lower(username), unique=True),
+    )
+
+
+# Progress of data migrations that run in batches at startup
+class MigrationModel(Base):
+    __tablename__ = "schema_migrations"
+
+    name = Column(String(100), primary_key=True)
+    # Highest primary key already processed, so an interrupted run resumes after it
+    last_id = Column(Integer, nullable=False, default=0)
+    completed = Column(Boolean, nullable=False, default=False)
+
+
+
+STAY_DATE_FORMATS = ("%Y-%m-%d", "%b %d, %Y")
+
+
+def parse_stay_date(value):
+    """Parse a checkin/checkout string (ISO or "Dec 10, 2024") into a date."""
+    if value is None or isinstance(value, date):
+        return value
+    for fmt in STAY_DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def sync_schema(conn):
+    """Add columns and indexes declared on the models after their table already existed.
+
+    Returns the ``(table, column)`` names that were added, so one-off
+    backfills can run only in the migration that introduced their column.
+    """
+    inspector = inspect(conn)
+    added = set()
+    # Read index names straight from the catalog: SQLite's reflection skips
+    # expression indexes such as ix_users_username_lower, so checkfirst would
+    # try to create them again on every start
+    index_names = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                references = "".join(
+                    f" REFERENCES {fk.column.table.name}({fk.column.name})" for fk in column.foreign_keys
+                )
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{references}"))
+                added.add((table.name, column.name))
+        for index in table.indexes:
+            if index.name not in index_names:
+                create_index(conn, index)
+    return added
+
+
+def create_index(conn, index):
+    """Create ``index``, explaining which rows block it when it is unique."""
+    try:
+        index.create(conn)
+    except IntegrityError as exc:
+        keys = list(index.expressions)
+        duplicates = conn.execute(
+            select(*keys).group_by(*keys).having(func.count() > 1).limit(10)
+        ).all()
+        raise RuntimeError(
+            f"Cannot create unique index {index.name} on {index.table.name}: these values occur more than "
+            f"once (compared as the index compares them): {[tuple(row) for row in duplicates]}. "
+            f"Rename or remove the duplicate rows and start again."
+        ) from exc
+
+
+def backfill_room_ids(conn):
+    """Link bookings written before room_id existed to the room carrying their title.
+
+    Duplicate titles resolve to the lowest room id; bookings whose title
+    matches no room keep room_id NULL. The title-keyed stay index that
+    room_id replaces is dropped.
+    """
+    bookings = BookingModel.__table__
+    rooms = RoomModel.__table__
+    conn.execute(
+        bookings.update()
+        .where(bookings.c.room_id.is_(None))
+        .values(room_id=select(rooms.c.id).where(rooms.c.title == bookings.c.room).order_by(rooms.c.id).limit(1).scalar_subquery())
+    )
+    conn.execute(text("DROP INDEX IF EXISTS ix_bookings_room_stay"))
+
+
+STAY_DATE_MIGRATION = "backfill_stay_dates"
+MIGRATION_BATCH_ROWS = int(os.environ.get("MIGRATION_BATCH_ROWS", "5000"))
+
+
+async def backfill_stay_dates(batch_rows: int = MIGRATION_BATCH_ROWS):
+    """Parse legacy checkin/checkout strings into checkin_date/checkout_date.
+
+    Bookings are walked in primary-key order, ``batch_rows`` per
+    transaction, and the last id of every batch is recorded in
+    schema_migrations alongside it. A run that is interrupted picks up after
+    the last committed batch, and once the walk finishes later startups only
+    read the marker row. Rows that already have a checkin_date are left
+    untouched; strings in neither STAY_DATE_FORMATS format stay NULL.
+    """
+    marker = MigrationModel.__table__
+    bookings = BookingModel.__table__
+    async with engine.begin() as conn:
+        await conn.execute(
+            sqlite_insert(marker).values(name=STAY_DATE_MIGRATION, last_id=0, completed=False).on_conflict_do_nothing()
+        )
+        state = (await conn.execute(select(marker.c.last_id, marker.c.completed).where(marker.c.name == STAY_DATE_MIGRATION))).one()
+    if state.completed:
+        return
+    last_id = state.last_id
+
+    fill = (
+        bookings.update()
+        .where(bookings.c.id == bindparam("b_id"), bookings.c.checkin_date.is_(None))
+        .values(checkin_date=bindparam("b_checkin"), checkout_date=bindparam("b_checkout"))
+    )
+    while True:
+        async with engine.begin() as conn:
+            rows = (await conn.execute(
+                select(bookings.c.id, bookings.c.checkin, bookings.c.checkout)
+                .where(bookings.c.id > last_id, bookings.c.checkin_date.is_(None))
+                .order_by(bookings.c.id)
+                .limit(batch_rows)
+            )).all()
+            params = []
+            for row in rows:
+                checkin_date = parse_stay_date(row.checkin)
+                if checkin_date is not None:
+                    params.append({"b_id": row.id, "b_checkin": checkin_date, "b_checkout": parse_stay_date(row.checkout)})
+            if params:
+                await conn.execute(fill, params)
+            if rows:
+                last_id = rows[-1].id
+            await conn.execute(
+                marker.update()
+                .where(marker.c.name == STAY_DATE_MIGRATION)
+                .values(last_id=last_id, completed=len(rows) < batch_rows)
+            )
+        if len(rows) < batch_rows:
+            return
 
 
 async def init_db():
-    """Initialize database - create all tables and seed initial data."""
-    # Create all tables
+    """Create missing tables, columns and indexes, and backfill derived columns.
+
+    Runs on every startup (once per worker), so it must not read whole
+    tables. Sample data is only written by ``seed_db``.
+    """
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    
-    # Seed sample data if tables are empty
+        added = await conn.run_sync(sync_schema)
+        if ("bookings", "room_id") in added:
+            await conn.run_sync(backfill_room_ids)
+    await backfill_stay_dates()
+
+
+async def is_empty(session, model) -> bool:
+    """True if ``model``'s table has no rows; reads at most one primary key."""
+    res = await session.execute(select(model.id).limit(1))
+    return res.first() is None
+
+
+async def seed_db():
+    """Insert sample rooms, bookings and users into whichever of those tables are empty."""
     async with AsyncSessionLocal() as session:
         # Check and seed rooms
-        res = await session.execute(select(RoomModel))
-        rooms = res.scalars().all()
-        if not rooms:
+        if await is_empty(session, RoomModel):
             sample_rooms = [
                 RoomModel(
                     title="Deluxe Suite",
@@ -103,15 +336,21 @@ async def init_db():
             session.add_all(sample_rooms)
         
         # Check and seed bookings
-        resb = await session.execute(select(BookingModel))
-        bookings = resb.scalars().all()
-        if not bookings:
+        if await is_empty(session, BookingModel):
+            await session.flush()
+            res = await session.execute(
+                select(RoomModel.title, RoomModel.id).where(RoomModel.title.in_(["Deluxe Suite", "Standard Room"]))
+            )
+            room_ids = dict(res.all())
             sample_bookings = [
                 BookingModel(
                     guest_name="John Smith",
                     room="Deluxe Suite",
+                    room_id=room_ids.get("Deluxe Suite"),
                     checkin="Dec 10, 2024",
                     checkout="Dec 15, 2024",
+                    checkin_date=date(2024, 12, 10),
+                    checkout_date=date(2024, 12, 15),
                     status="Confirmed",
                     nights=5,
                     total=995.0
@@ -119,8 +358,11 @@ async def init_db():
                 BookingModel(
                     guest_name="Emily Johnson",
                     room="Standard Room",
+                    room_id=room_ids.get("Standard Room"),
                     checkin="Dec 8, 2024",
                     checkout="Dec 10, 2024",
+                    checkin_date=date(2024, 12, 8),
+                    checkout_date=date(2024, 12, 10),
                     status="Pending",
                     nights=2,
                     total=198.0
@@ -128,8 +370,11 @@ async def init_db():
                 BookingModel(
                     guest_name="Michael Brown",
                     room="Deluxe Suite",
+                    room_id=room_ids.get("Deluxe Suite"),
                     checkin="Dec 12, 2024",
                     checkout="Dec 18, 2024",
+                    checkin_date=date(2024, 12, 12),
+                    checkout_date=date(2024, 12, 18),
                     status="Confirmed",
                     nights=6,
                     total=1194.0
@@ -138,9 +383,7 @@ async def init_db():
             session.add_all(sample_bookings)
         
         # Check and seed users
-        resu = await session.execute(select(UserModel))
-        users = resu.scalars().all()
-        if not users:
+        if await is_empty(session, UserModel):
             sample_users = [
                 UserModel(
                     username="admin",
@@ -162,3 +405,56 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Dependency to get database session for FastAPI endpoints."""
     async with AsyncSessionLocal() as session:
         yield session
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency for read-only endpoints; uses the read pool in the production profile."""
+    async with ReadSessionLocal() as session:
+        yield session
+
+
+# Queues this process's write transactions in arrival order; SQLite's own
+# busy handler polls with growing sleeps and can starve a writer past
+# busy_timeout when many wait at once
+_write_lock = asyncio.Lock()
+
+
+async def begin_immediate(session: AsyncSession) -> None:
+    """Start the session's transaction with SQLite's write lock already taken.
+
+    pysqlite only opens a transaction at the first INSERT/UPDATE/DELETE, so a
+    check followed by a write (e.g. an overlap check, then the insert) would
+    let a concurrent writer slip in between. Call this before the check: other
+    writers wait until this transaction commits or rolls back, in this process
+    on ``_write_lock`` and across processes on busy_timeout.
+    """
+    await _write_lock.acquire()
+    event.listen(session.sync_session, "after_transaction_end", _release_write_lock, once=True)
+    try:
+        await session.execute(text("BEGIN IMMEDIATE"))
+    except BaseException:
+        # Ends the transaction, which releases the lock through the listener
+        await session.rollback()
+        raise
+
+
+def _release_write_lock(session, transaction):
+    _write_lock.release()
+
+
+async def _main(seed: bool):
+    await init_db()
+    if seed:
+        await seed_db()
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Create or migrate the database schema.")
+    parser.add_argument("--seed", action="store_true", help="insert sample data into empty tables")
+    asyncio.run(_main(parser.parse_args().seed))
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class EntityCache:
+    """Bounded LRU cache with TTL for serialized single-row lookups.
+
+    Runs on the event loop only, so no locks are needed: all bookkeeping
+    happens between awaits. Concurrent misses for one key share a single
+    in-flight load. A write that invalidates a key while its load is still
+    running discards that load's result instead of caching it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]):
+        """Return the cached value for ``key``, loading it once on a miss.
+
+        ``None`` results (missing rows) are passed through but never cached.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+            self.expirations += 1
+
+        self.misses += 1
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            current = self._inflight.get(key)
+            if current is future:
+                del self._inflight[key]
+        future.set_result(value)
+        if value is not None and current is future:
+            self._store(key, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Drop ``key`` and orphan any load of it that is still running."""
+        self.invalidations += 1
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def invalidate_kind(self, kind: Hashable):
+        """Drop every ``(kind, id)`` key, e.g. all bookings after a room they embed changed."""
+        self.invalidations += 1
+        for mapping in (self._entries, self._inflight):
+            for key in [k for k in mapping if isinstance(k, tuple) and k[0] == kind]:
+                del mapping[key]
+
+    def clear(self):
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+cache = EntityCache(
+    maxsize=int(os.environ.get("ENTITY_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("ENTITY_CACHE_TTL", "30")),
+)
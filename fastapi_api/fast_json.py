@@ -0,0 +1,44 @@
+"""JSON encoding for list endpoints that bypass ORM objects and response_model.
+
+The handlers keep ``response_model`` on their route so the OpenAPI schema is
+unchanged, but select plain column tuples and return the encoded bytes
+directly, skipping per-row model instantiation and FastAPI's second
+validation pass.
+"""
+
+import json
+from datetime import date
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON, only slower
+    orjson = None
+
+
+def _default(value):
+    # orjson writes dates natively as YYYY-MM-DD; match it
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def rows_response(keys, rows, response: Response) -> Response:
+    """Encode column tuples as a JSON array of objects keyed by ``keys``.
+
+    Headers already set on the injected ``response`` (ETag, next-page cursor)
+    are carried over, since FastAPI ignores them when a Response is returned.
+    """
+    return json_response([dict(zip(keys, row)) for row in rows], response)
+
+
+def json_response(content, response: Response) -> Response:
+    """Encode ``content`` as-is, keeping the headers set on the injected ``response``."""
+    return Response(dumps(content), media_type="application/json", headers=dict(response.headers))
@@ -0,0 +1,31 @@
+from fastapi import HTTPException, Query
+
+
+def sparse_fields(columns):
+    """Dependency factory for ``?fields=``: the subset of ``columns`` to return.
+
+    ``fields`` is a comma-separated list of column names checked against
+    ``columns``; an unknown name is a 400. ``id`` is always included since
+    page cursors are built from it. Without the parameter the dependency
+    returns ``columns`` itself, so handlers can tell a full response apart
+    with an identity check.
+    """
+    by_name = {column.key: column for column in columns}
+    allowed = ", ".join(by_name)
+
+    def dependency(fields: str | None = Query(None, description=f"Comma-separated subset of: {allowed}")):
+        if fields is None:
+            return columns
+        names = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(names - by_name.keys())
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}. Expected any of: {allowed}")
+        names.add("id")
+        return [column for column in columns if column.key in names]
+
+    return dependency
+
+
+def project(item: dict, columns) -> dict:
+    """Keep only ``columns`` of a serialized row, e.g. one read from the entity cache."""
+    return {column.key: item[column.key] for column in columns}
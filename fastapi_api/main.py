@@ -1,7 +1,12 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 import database
+import entity_cache
+import metrics
+import occupancy
+import tracing
+import write_batcher
 import routers.rooms as rooms_router
 import routers.bookings as bookings_router
 import routers.users as users_router
@@ -20,13 +25,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Link", "Server-Timing"],
 )
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(metrics.MetricsMiddleware, routes=app.router.routes)
+
+metrics.instrument_engine(database.engine, "primary")
+tracing.instrument_engine(database.engine)
+if database.read_engine is not database.engine:
+    metrics.instrument_engine(database.read_engine, "read")
+    tracing.instrument_engine(database.read_engine)
 
 
 @app.on_event("startup")
 async def on_startup():
     """Initialize database on startup."""
     await database.init_db()
+    async with database.ReadSessionLocal() as session:
+        await occupancy.store.load(session)
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Write out any bookings still waiting in the group-commit queue."""
+    await write_batcher.batcher.drain()
 
 
 @app.get("/")
@@ -45,6 +67,18 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Entity cache counters for sizing ENTITY_CACHE_SIZE / ENTITY_CACHE_TTL."""
+    return entity_cache.cache.stats()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Request, SQL and connection-pool metrics in the Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # Include routers
 app.include_router(rooms_router.router, prefix="/api", tags=["Rooms"])
 app.include_router(bookings_router.router, prefix="/api", tags=["Bookings"])
@@ -0,0 +1,235 @@
+"""In-process metrics exposed at /metrics in the Prometheus text format.
+
+Counters live in plain dicts keyed by label values and are only touched from
+the event loop thread (SQLAlchemy's cursor events for the async drivers also
+fire there), so recording a sample is a couple of dict operations with no
+locking. Every uvicorn worker keeps its own numbers; scrape each worker, or
+aggregate them in Prometheus.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _labels(self.labels, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, labels: tuple, value: float):
+        self.values[labels] = value
+
+
+class Histogram:
+    """Cumulative-bucket histogram; ``observe`` is one bisect and three additions."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=HTTP_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self.values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _labels(self.labels + ("le",), labels + (_number(bound),)), cumulative
+            yield f"{self.name}_sum", _labels(self.labels, labels), total
+            yield f"{self.name}_count", _labels(self.labels, labels), count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by method, route template and status code.", ("method", "route", "status")))
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last body byte.", ("method", "route")))
+HTTP_IN_FLIGHT = registry.register(Gauge(
+    "http_requests_in_progress", "Requests currently being handled.", ("method", "route")))
+DB_QUERIES = registry.register(Counter(
+    "db_queries_total", "SQL statements executed, by engine.", ("engine",)))
+DB_QUERY_TIME = registry.register(Histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements, by engine.", ("engine",), DB_BUCKETS))
+DB_POOL_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection (or opening one).", ("engine",), DB_BUCKETS))
+DB_POOL_CHECKED_OUT = registry.register(Gauge(
+    "db_pool_connections_checked_out", "Connections currently checked out of the pool.", ("engine",)))
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and in-flight requests per route template.
+
+    Requests are labelled with the path template (``/api/rooms/{room_id}``)
+    so label cardinality stays bounded by the number of routes.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        labels = (scope["method"], self._route(scope))
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(labels)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.observe(time.perf_counter() - start, labels)
+            HTTP_REQUESTS.inc(labels + (str(status),))
+            HTTP_IN_FLIGHT.dec(labels)
+
+
+def instrument_engine(async_engine, name: str):
+    """Count and time statements on ``async_engine`` and time its pool checkouts."""
+    sync_engine = async_engine.sync_engine
+    labels = (name,)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_TIME.observe(time.perf_counter() - conn.info["query_start"].pop(), labels)
+        DB_QUERIES.inc(labels)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    # The pool has no "before checkout" event, so time the private _do_get
+    # that every checkout goes through: a queue wait for pooled engines, a
+    # fresh connect for NullPool. _do_get is internal to SQLAlchemy (this
+    # matches the 2.0.x pinned in requirements.txt); on a version without it
+    # the wait histogram stays empty instead of failing at import. The
+    # wrapper sits on the pool instance, and engine.dispose() replaces the
+    # pool, so it is put back on the new pool from engine_disposed.
+    def time_checkouts(pool):
+        do_get = getattr(pool, "_do_get", None)
+        if do_get is None:
+            return
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                DB_POOL_WAIT.observe(time.perf_counter() - start, labels)
+
+        pool._do_get = timed_do_get
+
+    time_checkouts(sync_engine.pool)
+
+    @event.listens_for(sync_engine, "engine_disposed")
+    def engine_disposed(engine):
+        time_checkouts(engine.pool)
+
+    def collect():
+        if hasattr(sync_engine.pool, "checkedout"):
+            DB_POOL_CHECKED_OUT.set(labels, sync_engine.pool.checkedout())
+
+    registry.collectors.append(collect)
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,150 @@
+from datetime import date, timedelta
+from typing import Dict
+
+from sqlalchemy import or_, select
+
+import database
+from availability import INACTIVE_BOOKING_STATUSES
+
+# Bit 0 of every room bitmap is this night; earlier nights are not tracked
+EPOCH = date(2000, 1, 1)
+_EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def _night(day: date) -> int:
+    return day.toordinal() - _EPOCH_ORDINAL
+
+
+class OccupancyStore:
+    """Per-room nightly occupancy kept as one bit per night in a bytearray, keyed by room id.
+
+    Night ``n`` of a room is bit ``n % 8`` of byte ``n // 8``, counted from
+    ``EPOCH``. The store is built once at startup and then kept current by the
+    booking write handlers, so range questions are answered with a popcount
+    over a slice of bytes rather than a scan over bookings.
+
+    The store lives in process memory: every uvicorn worker holds its own copy
+    and only sees the writes it served itself.
+    """
+
+    def __init__(self):
+        self._rooms: Dict[int, bytearray] = {}
+
+    def clear(self):
+        self._rooms.clear()
+
+    async def load(self, session):
+        """Rebuild every room bitmap from the active bookings in the database."""
+        booking = database.BookingModel
+        stmt = select(booking.room_id, booking.checkin_date, booking.checkout_date).where(
+            booking.checkin_date.is_not(None),
+            booking.checkout_date.is_not(None),
+            or_(booking.status.is_(None), booking.status.not_in(INACTIVE_BOOKING_STATUSES)),
+        )
+        self.clear()
+        result = await session.stream(stmt)
+        async for room_id, checkin, checkout in result:
+            self.add(room_id, checkin, checkout)
+
+    def add(self, room_id, checkin, checkout):
+        """Mark the nights from checkin up to (not including) checkout as occupied."""
+        if room_id is None or checkin is None or checkout is None:
+            return
+        lo, hi = max(_night(checkin), 0), _night(checkout)
+        if hi <= lo:
+            return
+        bits = self._rooms.setdefault(room_id, bytearray())
+        self._fill(bits, lo, hi, True)
+
+    async def refresh(self, session, room_id, checkin, checkout):
+        """Recompute a room's nights in [checkin, checkout) from the bookings that still hold them.
+
+        Used after updates and deletes, where clearing bits blindly could free
+        nights that another booking also covers.
+        """
+        if room_id is None or checkin is None or checkout is None:
+            return
+        await self.refresh_many(session, {room_id: (checkin, checkout)})
+
+    async def refresh_many(self, session, spans):
+        """``refresh`` for several rooms at once: ``spans`` maps room id to (checkin, checkout).
+
+        The bookings of every room are read with one query over the rooms and
+        the union of their spans, then clipped to each room's own span.
+        """
+        if not spans:
+            return
+        booking = database.BookingModel
+        res = await session.execute(
+            select(booking.room_id, booking.checkin_date, booking.checkout_date).where(
+                booking.room_id.in_(spans),
+                booking.checkout_date > min(lo for lo, _ in spans.values()),
+                booking.checkin_date < max(hi for _, hi in spans.values()),
+                or_(booking.status.is_(None), booking.status.not_in(INACTIVE_BOOKING_STATUSES)),
+            )
+        )
+        stays = res.all()
+        for room_id, (checkin, checkout) in spans.items():
+            bits = self._rooms.get(room_id)
+            if bits is not None:
+                lo, hi = max(_night(checkin), 0), min(_night(checkout), len(bits) * 8)
+                if lo < hi:
+                    self._fill(bits, lo, hi, False)
+        for room_id, stay_in, stay_out in stays:
+            checkin, checkout = spans[room_id]
+            if stay_in < checkout and stay_out > checkin:
+                self.add(room_id, max(stay_in, checkin), min(stay_out, checkout))
+
+    def occupied_nights(self, room_id, start: date, end: date) -> int:
+        """Number of occupied nights of room ``room_id`` in [start, end)."""
+        bits = self._rooms.get(room_id)
+        if not bits:
+            return 0
+        lo, hi = max(_night(start), 0), min(_night(end), len(bits) * 8)
+        if hi <= lo:
+            return 0
+        chunk = int.from_bytes(bits[lo >> 3:((hi - 1) >> 3) + 1], "little")
+        chunk >>= lo & 7
+        chunk &= (1 << (hi - lo)) - 1
+        return chunk.bit_count()
+
+    def nights(self, room_id, start: date, end: date):
+        """Per-night occupancy flags of room ``room_id`` for [start, end)."""
+        bits = self._rooms.get(room_id) or bytearray()
+        flags = []
+        for n in range(_night(start), _night(end)):
+            flags.append(0 <= n < len(bits) * 8 and bool(bits[n >> 3] >> (n & 7) & 1))
+        return flags
+
+    @staticmethod
+    def _fill(bits: bytearray, lo: int, hi: int, value: bool):
+        needed = (hi + 7) >> 3
+        if len(bits) < needed:
+            bits.extend(bytes(needed - len(bits)))
+        while lo < hi and lo & 7:
+            bits[lo >> 3] = bits[lo >> 3] | (1 << (lo & 7)) if value else bits[lo >> 3] & ~(1 << (lo & 7))
+            lo += 1
+        whole_end = hi & ~7
+        if lo < whole_end:
+            bits[lo >> 3:whole_end >> 3] = (b"\xff" if value else b"\x00") * ((whole_end - lo) >> 3)
+            lo = whole_end
+        while lo < hi:
+            bits[lo >> 3] = bits[lo >> 3] | (1 << (lo & 7)) if value else bits[lo >> 3] & ~(1 << (lo & 7))
+            lo += 1
+
+
+def month_range(month: str):
+    """First night of ``YYYY-MM`` and the first night of the following month.
+
+    Raises ValueError for a month ``date`` cannot hold, including 9999-12,
+    whose following month is out of range.
+    """
+    year, mon = (int(part) for part in month.split("-"))
+    if year < date.min.year or (year, mon) >= (date.max.year, 12):
+        raise ValueError(f"month must be between {date.min.year:04d}-01 and {date.max.year:04d}-11")
+    start = date(year, mon, 1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+store = OccupancyStore()
@@ -0,0 +1,49 @@
+from typing import Literal
+
+from fastapi import Query, Request, Response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PageParams:
+    """Keyset pagination parameters shared by the list endpoints.
+
+    Pages are ordered by primary key, ascending by default or newest first
+    with ``order=desc``. ``after`` is the last id the client has already seen,
+    so every page is an index range seek on ``id`` no matter how deep into the
+    table the client is.
+    """
+
+    def __init__(
+        self,
+        request: Request,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: int | None = Query(None, ge=0, description="Return rows that come after this id in page order"),
+        order: Literal["asc", "desc"] = "asc",
+    ):
+        self.request = request
+        self.limit = limit
+        self.after = after
+        self.order = order
+
+    def apply(self, stmt, model):
+        """Restrict a select to the requested page (one extra row detects a next page)."""
+        if self.order == "desc":
+            if self.after is not None:
+                stmt = stmt.where(model.id < self.after)
+            return stmt.order_by(model.id.desc()).limit(self.limit + 1)
+        if self.after is not None:
+            stmt = stmt.where(model.id > self.after)
+        return stmt.order_by(model.id).limit(self.limit + 1)
+
+    def finish(self, rows, response: Response):
+        """Trim the look-ahead row and expose the next cursor as response headers."""
+        rows = list(rows)
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            next_cursor = str(rows[-1].id)
+            response.headers["X-Next-Cursor"] = next_cursor
+            next_url = self.request.url.include_query_params(after=next_cursor)
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return rows
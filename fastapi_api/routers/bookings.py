@@ -1,71 +1,503 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from sqlalchemy import select
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import Dict, List, Literal
+import csv
+import io
+import json
+import re
+from sqlalchemy import delete, extract, func, insert, or_, select, update
+from pydantic import BaseModel, field_validator, model_validator
 
+import bulk
 import database
+import entity_cache
+import fast_json
+import fieldsets
+import occupancy
+import tracing
+import versioning
+import write_batcher
+from availability import INACTIVE_BOOKING_STATUSES, claim_stay, has_conflict, held_stays
+from pagination import PageParams
 
 router = APIRouter(prefix="/bookings", tags=["bookings"])
 
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
 
 class BookingSchema(BaseModel):
     id: int | None = None
     guest_name: str
-    room: str
-    checkin: str | None = None
-    checkout: str | None = None
+    # Writes name the room by room_id, or by title when room_id is omitted
+    room: str | None = None
+    room_id: int | None = None
+    checkin: date | None = None
+    checkout: date | None = None
     status: str | None = None
     nights: int | None = None
     total: float | None = None
+    # Read-only: current details of the booked room
+    room_type: str | None = None
+    room_price: float | None = None
+    room_image_url: str | None = None
+
+    @field_validator("checkin", "checkout", mode="before")
+    @classmethod
+    def check_iso_date(cls, value):
+        # Only YYYY-MM-DD; no "Dec 10, 2024", timestamps or datetimes
+        if value is None or isinstance(value, date) or (isinstance(value, str) and ISO_DATE.fullmatch(value)):
+            return value
+        raise ValueError("must be an ISO date (YYYY-MM-DD)")
+
+    @model_validator(mode="after")
+    def check_room(self):
+        if self.room is None and self.room_id is None:
+            raise ValueError("room or room_id is required")
+        return self
+
+
+class BookingWriteSchema(BookingSchema):
+    """Request body of booking writes: a stay is both dates, checkout after checkin.
+
+    Kept off BookingSchema so responses still serve stored rows that predate
+    the check. A booking with neither date holds no nights and stays valid;
+    rows whose legacy dates could not be parsed look like that.
+    """
+
+    @model_validator(mode="after")
+    def check_stay(self):
+        if (self.checkin is None) != (self.checkout is None):
+            raise ValueError("checkin and checkout must be given together")
+        if self.checkin is not None and self.checkout <= self.checkin:
+            raise ValueError("checkout must be after checkin")
+        return self
+
+
+# Columns written by create/update and handed back by RETURNING
+WRITE_FIELDS = ("id", "guest_name", "room", "room_id", "checkin", "checkout", "status", "nights", "total")
+WRITE_COLUMNS = [getattr(database.BookingModel, name) for name in WRITE_FIELDS]
+
+# The room's current title; bookings whose title never matched a room keep their own
+ROOM_TITLE = func.coalesce(database.RoomModel.title, database.BookingModel.room).label("room")
+
+# Read projection in BookingSchema field order, over booking_select's join; stay
+# dates come from the DATE columns, the string columns only keep what was posted
+_READ_COLUMNS = {
+    "room": ROOM_TITLE,
+    "checkin": database.BookingModel.checkin_date.label("checkin"),
+    "checkout": database.BookingModel.checkout_date.label("checkout"),
+}
+BOOKING_COLUMNS = [
+    _READ_COLUMNS.get(name, getattr(database.BookingModel, name)) for name in WRITE_FIELDS
+] + [
+    database.RoomModel.type.label("room_type"),
+    database.RoomModel.price.label("room_price"),
+    database.RoomModel.image_url.label("room_image_url"),
+]
+
+# Room details resolved for every write
+ROOM_INFO_COLUMNS = [database.RoomModel.id, database.RoomModel.title, database.RoomModel.type, database.RoomModel.price, database.RoomModel.image_url]
+
+
+def booking_select(columns):
+    """SELECT ``columns`` from bookings left-joined to their room on the primary key."""
+    return (
+        select(*columns)
+        .select_from(database.BookingModel)
+        .outerjoin(database.RoomModel, database.RoomModel.id == database.BookingModel.room_id)
+    )
+
+
+class MonthlyBookingStats(BaseModel):
+    month: str
+    bookings: int
+    revenue: float
+
+
+class BookingStatsSchema(BaseModel):
+    total_bookings: int
+    total_revenue: float
+    by_status: Dict[str, int]
+    revenue_by_status: Dict[str, float]
+    monthly: List[MonthlyBookingStats]
+
+
+@router.get("/", response_model=List[BookingSchema], dependencies=[Depends(versioning.conditional_get("bookings", "rooms"))])
+async def list_bookings(
+    response: Response,
+    page: PageParams = Depends(),
+    status: str | None = None,
+    room_id: int | None = None,
+    room: str | None = None,
+    guest_name: str | None = None,
+    checkin_from: date | None = None,
+    checkin_to: date | None = None,
+    min_total: float | None = Query(None, ge=0),
+    max_total: float | None = Query(None, ge=0),
+    fields=Depends(fieldsets.sparse_fields(BOOKING_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    stmt = booking_select(fields)
+    if status is not None:
+        stmt = stmt.where(database.BookingModel.status == status)
+    if room_id is not None:
+        stmt = stmt.where(database.BookingModel.room_id == room_id)
+    if room is not None:
+        stmt = stmt.where(ROOM_TITLE == room)
+    if guest_name is not None:
+        stmt = stmt.where(database.BookingModel.guest_name == guest_name)
+    if checkin_from is not None:
+        stmt = stmt.where(database.BookingModel.checkin_date >= checkin_from)
+    if checkin_to is not None:
+        stmt = stmt.where(database.BookingModel.checkin_date < checkin_to)
+    if min_total is not None:
+        stmt = stmt.where(database.BookingModel.total >= min_total)
+    if max_total is not None:
+        stmt = stmt.where(database.BookingModel.total <= max_total)
+    res = await session.execute(page.apply(stmt, database.BookingModel))
+    return fast_json.rows_response(res.keys(), page.finish(res, response), response)
+
+
+EXPORT_FIELDS = ['id', 'guest_name', 'room', 'room_id', 'checkin', 'checkout', 'status', 'nights', 'total']
+EXPORT_CHUNK_ROWS = 1000
+
+
+async def _export_rows(stmt, fmt):
+    """Encode streamed rows chunk by chunk; only one chunk is held in memory."""
+    if fmt == "csv":
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+    async with database.ReadSessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            buf = io.StringIO()
+            if fmt == "csv":
+                csv.writer(buf).writerows(rows)
+            else:
+                for row in rows:
+                    buf.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), default=date.isoformat))
+                    buf.write("\n")
+            yield buf.getvalue()
+
+
+@router.get("/export")
+async def export_bookings(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    checkin_from: date | None = None,
+    checkin_to: date | None = None,
+    status: str | None = None,
+):
+    """Stream every matching booking as NDJSON or CSV, ordered by id.
+
+    Rows are read through a server-side cursor in chunks of
+    EXPORT_CHUNK_ROWS and written out as they arrive, so memory use does not
+    grow with the table and the first bytes leave before the scan finishes.
+    ``checkin_from`` is inclusive and ``checkin_to`` exclusive.
+    """
+    model = database.BookingModel
+    columns = {column.key: column for column in BOOKING_COLUMNS}
+    stmt = booking_select([columns[f] for f in EXPORT_FIELDS]).order_by(model.id)
+    if checkin_from is not None:
+        stmt = stmt.where(model.checkin_date >= checkin_from)
+    if checkin_to is not None:
+        stmt = stmt.where(model.checkin_date < checkin_to)
+    if status is not None:
+        stmt = stmt.where(model.status == status)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(stmt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="bookings.{format}"'},
+    )
 
 
-@router.get("/", response_model=List[BookingSchema])
-async def list_bookings(session=Depends(database.get_session)):
-    res = await session.execute(select(database.BookingModel))
-    rows = res.scalars().all()
-    return [BookingSchema(**{k: getattr(r, k) for k in ['id','guest_name','room','checkin','checkout','status','nights','total']}) for r in rows]
+@router.get("/stats", response_model=BookingStatsSchema)
+async def booking_stats(months: int = Query(6, ge=1, le=36), session=Depends(database.get_read_session)):
+    """Booking counts and revenue by status, plus a per-month series by checkin date.
 
+    Everything comes from one GROUP BY over (year, month, status); the series
+    covers the last ``months`` calendar months up to the current one.
+    """
+    model = database.BookingModel
+    year = extract("year", model.checkin_date)
+    month = extract("month", model.checkin_date)
+    res = await session.execute(
+        select(year, month, model.status, func.count(model.id), func.coalesce(func.sum(model.total), 0.0))
+        .group_by(year, month, model.status)
+    )
 
-@router.post("/", response_model=BookingSchema)
-async def create_booking(b: BookingSchema, session=Depends(database.get_session)):
-    obj = database.BookingModel(guest_name=b.guest_name, room=b.room, checkin=b.checkin, checkout=b.checkout, status=b.status, nights=b.nights, total=b.total)
-    session.add(obj)
+    by_status: Dict[str, int] = {}
+    revenue_by_status: Dict[str, float] = {}
+    per_month: Dict[tuple, list] = {}
+    for row_year, row_month, status, count, revenue in res.all():
+        key = status or "Unknown"
+        by_status[key] = by_status.get(key, 0) + count
+        revenue_by_status[key] = revenue_by_status.get(key, 0.0) + revenue
+        if row_year is not None:
+            bucket = per_month.setdefault((int(row_year), int(row_month)), [0, 0.0])
+            bucket[0] += count
+            bucket[1] += revenue
+
+    today = date.today()
+    monthly = []
+    for offset in range(months - 1, -1, -1):
+        y, m = divmod(today.year * 12 + today.month - 1 - offset, 12)
+        count, revenue = per_month.get((y, m + 1), (0, 0.0))
+        monthly.append(MonthlyBookingStats(month=f"{y:04d}-{m + 1:02d}", bookings=count, revenue=revenue))
+
+    return BookingStatsSchema(
+        total_bookings=sum(by_status.values()),
+        total_revenue=sum(revenue_by_status.values()),
+        by_status=by_status,
+        revenue_by_status=revenue_by_status,
+        monthly=monthly,
+    )
+
+
+async def _room_lookup(session, bookings):
+    """Rooms referenced by ``bookings`` (by room_id, else by title), keyed both ways, from one query."""
+    model = database.RoomModel
+    ids = {b.room_id for b in bookings if b.room_id is not None}
+    titles = {b.room for b in bookings if b.room_id is None}
+    by_id, by_title = {}, {}
+    if ids or titles:
+        res = await session.execute(
+            select(*ROOM_INFO_COLUMNS).where(or_(model.id.in_(ids), model.title.in_(titles))).order_by(model.id)
+        )
+        for room in res.all():
+            by_id[room.id] = room
+            by_title.setdefault(room.title, room)
+    return by_id, by_title
+
+
+def _booking_row(b: BookingWriteSchema, rooms, legacy_title=None):
+    """Column values for writing ``b`` with its room resolved, and that room.
+
+    The stored title is set to the room's current one. A booking that
+    already carried a title matching no room (``legacy_title``) may keep it
+    with no room_id; any other unknown room raises ValueError.
+    """
+    by_id, by_title = rooms
+    room = by_id.get(b.room_id) if b.room_id is not None else by_title.get(b.room)
+    row = b.model_dump(include=set(WRITE_FIELDS))
+    if room is not None:
+        row["room_id"], row["room"] = room.id, room.title
+    elif b.room_id is not None or b.room != legacy_title:
+        raise ValueError(f"Unknown room: {b.room_id if b.room_id is not None else b.room}")
+    row["checkin"] = b.checkin.isoformat() if b.checkin else None
+    row["checkout"] = b.checkout.isoformat() if b.checkout else None
+    row["checkin_date"] = b.checkin
+    row["checkout_date"] = b.checkout
+    return row, room
+
+
+def _booking_out(values, room):
+    """Response for a written booking: its column values plus the details of its room."""
+    return BookingSchema(
+        **values,
+        room_type=room.type if room else None,
+        room_price=room.price if room else None,
+        room_image_url=room.image_url if room else None,
+    )
+
+
+@router.post("/", response_model=BookingSchema, dependencies=[Depends(tracing.budget(4))])
+async def create_booking(
+    b: BookingWriteSchema,
+    session=Depends(database.get_session),
+    read_session=Depends(database.get_read_session),
+):
+    # The room is resolved on the read pool: the write session only checks out
+    # a connection on first use, and with write batching it must not hold the
+    # (in the production profile, single) writer connection the flush needs
+    try:
+        row, room = _booking_row(b, await _room_lookup(read_session, [b]))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    del row["id"]
+    if write_batcher.ENABLED:
+        new_id = await write_batcher.batcher.submit(row)
+        return _booking_out({**row, "id": new_id}, room)
+    # The overlap check and the insert must see the same bookings
+    await database.begin_immediate(session)
+    if b.status not in INACTIVE_BOOKING_STATUSES and await has_conflict(session, row["room_id"], row["checkin_date"], row["checkout_date"]):
+        raise HTTPException(status_code=409, detail="Room is already booked for these dates")
+    res = await session.execute(insert(database.BookingModel).values(**row).returning(*WRITE_COLUMNS))
+    created = res.one()
     await session.commit()
-    await session.refresh(obj)
-    return BookingSchema(id=obj.id, guest_name=obj.guest_name, room=obj.room, checkin=obj.checkin, checkout=obj.checkout, status=obj.status, nights=obj.nights, total=obj.total)
+    if b.status not in INACTIVE_BOOKING_STATUSES:
+        occupancy.store.add(row["room_id"], row["checkin_date"], row["checkout_date"])
+    versioning.bump("bookings")
+    return _booking_out(created._mapping, room)
+
+
+@router.post("/bulk", response_model=bulk.BulkResponse)
+async def bulk_bookings(req: bulk.BulkRequest, session=Depends(database.get_session)):
+    """Create, update and delete many bookings in one transaction, with a result per item.
+
+    Overlaps are checked in memory against the active stays of the rooms in
+    the batch, fetched with a single query, and against the other items of
+    the same batch.
+    """
+    model = database.BookingModel
+    results = []
+    creates = bulk.validate_items(BookingWriteSchema, req.create, "create", results)
+    updates = bulk.validate_items(BookingWriteSchema, req.update, "update", results)
+    await database.begin_immediate(session)
 
+    # Current stays of every booking the batch touches, for checks and occupancy upkeep
+    target_ids = {b.id for _, b in updates if b.id is not None} | set(req.delete)
+    previous = {}
+    if target_ids:
+        res = await session.execute(
+            select(model.id, model.room, model.room_id, model.checkin_date, model.checkout_date).where(model.id.in_(target_ids))
+        )
+        previous = {row.id: row for row in res.all()}
+    claimed = set()
+    update_targets = dict(bulk.check_targets("update", [(i, b.id) for i, b in updates], previous, claimed, results))
+    delete_targets = bulk.check_targets("delete", list(enumerate(req.delete)), previous, claimed, results)
+    updates = [(i, b) for i, b in updates if i in update_targets]
 
-@router.get("/{booking_id}", response_model=BookingSchema)
-async def get_booking(booking_id: int, session=Depends(database.get_session)):
-    obj = await session.get(database.BookingModel, booking_id)
-    if not obj:
+    # Every room the batch names, from one query
+    rooms = await _room_lookup(session, [b for _, b in updates + creates])
+
+    def resolve(op, index, b, legacy_title=None):
+        try:
+            return _booking_row(b, rooms, legacy_title)[0]
+        except ValueError as exc:
+            results.append(bulk.BulkItemResult(op=op, index=index, id=b.id, status="error", detail=str(exc)))
+            return None
+
+    updates = [(i, resolve("update", i, b, previous[b.id].room if previous[b.id].room_id is None else None)) for i, b in updates]
+    creates = [(i, resolve("create", i, b)) for i, b in creates]
+    updates = [(i, row) for i, row in updates if row is not None]
+    creates = [(i, row) for i, row in creates if row is not None]
+
+    # Active stays already held in the rooms and dates the batch asks for
+    held = await held_stays(session, [row for _, row in updates + creates], exclude_ids=claimed)
+
+    def reserve(op, index, row):
+        if claim_stay(held, row):
+            return True
+        results.append(bulk.BulkItemResult(op=op, index=index, id=row.get("id"), status="error", detail="Room is already booked for these dates"))
+        return False
+
+    updates = [(i, row) for i, row in updates if reserve("update", i, row)]
+    creates = [(i, row) for i, row in creates if reserve("create", i, row)]
+
+    if creates:
+        res = await session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            [{k: v for k, v in row.items() if k != "id"} for _, row in creates],
+        )
+        for (index, row), new_id in zip(creates, res.scalars().all()):
+            row["id"] = new_id
+            results.append(bulk.BulkItemResult(op="create", index=index, id=new_id, status="created"))
+    if updates:
+        await session.execute(update(model), [row for _, row in updates])
+        for index, row in updates:
+            results.append(bulk.BulkItemResult(op="update", index=index, id=row["id"], status="updated"))
+    if delete_targets:
+        await session.execute(delete(model).where(model.id.in_([i for _, i in delete_targets])))
+        for index, item_id in delete_targets:
+            results.append(bulk.BulkItemResult(op="delete", index=index, id=item_id, status="deleted"))
+    await session.commit()
+
+    # New stays only set nights; the rooms whose stays moved or went away are
+    # recomputed over the span of nights the batch touched, in one query
+    for _, row in creates:
+        if row["status"] not in INACTIVE_BOOKING_STATUSES:
+            occupancy.store.add(row["room_id"], row["checkin_date"], row["checkout_date"])
+    spans = {}
+    stays = [previous[row["id"]] for _, row in updates] + [previous[i] for _, i in delete_targets]
+    stays = [(stay.room_id, stay.checkin_date, stay.checkout_date) for stay in stays]
+    stays += [(row["room_id"], row["checkin_date"], row["checkout_date"]) for _, row in updates]
+    for room_id, checkin_date, checkout_date in stays:
+        if room_id is None or checkin_date is None or checkout_date is None:
+            continue
+        lo, hi = spans.get(room_id, (checkin_date, checkout_date))
+        spans[room_id] = (min(lo, checkin_date), max(hi, checkout_date))
+    await occupancy.store.refresh_many(session, spans)
+
+    for _, row in updates:
+        entity_cache.cache.invalidate(("bookings", row["id"]))
+    for _, item_id in delete_targets:
+        entity_cache.cache.invalidate(("bookings", item_id))
+    if creates or updates or delete_targets:
+        versioning.bump("bookings")
+    return bulk.summarize(results)
+
+
+@router.get("/{booking_id}", response_model=BookingSchema, dependencies=[Depends(versioning.conditional_get("bookings", "rooms"))])
+async def get_booking(
+    booking_id: int,
+    response: Response,
+    fields=Depends(fieldsets.sparse_fields(BOOKING_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    async def load():
+        res = await session.execute(booking_select(BOOKING_COLUMNS).where(database.BookingModel.id == booking_id))
+        row = res.one_or_none()
+        return dict(row._mapping) if row is not None else None
+
+    booking = await entity_cache.cache.get_or_load(("bookings", booking_id), load)
+    if booking is None:
         raise HTTPException(status_code=404, detail="Booking not found")
-    return BookingSchema(id=obj.id, guest_name=obj.guest_name, room=obj.room, checkin=obj.checkin, checkout=obj.checkout, status=obj.status, nights=obj.nights, total=obj.total)
+    if fields is not BOOKING_COLUMNS:
+        return fast_json.json_response(fieldsets.project(booking, fields), response)
+    return booking
 
 
-@router.put("/{booking_id}", response_model=BookingSchema)
-async def update_booking(booking_id: int, b: BookingSchema, session=Depends(database.get_session)):
-    obj = await session.get(database.BookingModel, booking_id)
-    if not obj:
+@router.put("/{booking_id}", response_model=BookingSchema, dependencies=[Depends(tracing.budget(7))])
+async def update_booking(booking_id: int, b: BookingWriteSchema, session=Depends(database.get_session)):
+    model = database.BookingModel
+    await database.begin_immediate(session)
+    # The occupancy bitmap has to forget the old stay, which RETURNING cannot report
+    res = await session.execute(
+        select(model.room, model.room_id, model.checkin_date, model.checkout_date).where(model.id == booking_id)
+    )
+    previous = res.one_or_none()
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    try:
+        row, room = _booking_row(b, await _room_lookup(session, [b]), previous.room if previous.room_id is None else None)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    del row["id"]
+    if b.status not in INACTIVE_BOOKING_STATUSES and await has_conflict(session, row["room_id"], row["checkin_date"], row["checkout_date"], exclude_id=booking_id):
+        raise HTTPException(status_code=409, detail="Room is already booked for these dates")
+    res = await session.execute(
+        update(model)
+        .where(model.id == booking_id)
+        .values(**row)
+        .returning(*WRITE_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    updated = res.one_or_none()
+    if updated is None:
         raise HTTPException(status_code=404, detail="Booking not found")
-    obj.guest_name = b.guest_name
-    obj.room = b.room
-    obj.checkin = b.checkin
-    obj.checkout = b.checkout
-    obj.status = b.status
-    obj.nights = b.nights
-    obj.total = b.total
-    session.add(obj)
     await session.commit()
-    await session.refresh(obj)
-    return BookingSchema(id=obj.id, guest_name=obj.guest_name, room=obj.room, checkin=obj.checkin, checkout=obj.checkout, status=obj.status, nights=obj.nights, total=obj.total)
+    entity_cache.cache.invalidate(("bookings", booking_id))
+    await occupancy.store.refresh(session, previous.room_id, previous.checkin_date, previous.checkout_date)
+    await occupancy.store.refresh(session, row["room_id"], row["checkin_date"], row["checkout_date"])
+    versioning.bump("bookings")
+    return _booking_out(updated._mapping, room)
 
 
-@router.delete("/{booking_id}")
+@router.delete("/{booking_id}", dependencies=[Depends(tracing.budget(2))])
 async def delete_booking(booking_id: int, session=Depends(database.get_session)):
-    obj = await session.get(database.BookingModel, booking_id)
-    if not obj:
+    model = database.BookingModel
+    res = await session.execute(
+        delete(model)
+        .where(model.id == booking_id)
+        .returning(model.room_id, model.checkin_date, model.checkout_date)
+        .execution_options(synchronize_session=False)
+    )
+    previous_stay = res.one_or_none()
+    if previous_stay is None:
         raise HTTPException(status_code=404, detail="Booking not found")
-    await session.delete(obj)
     await session.commit()
+    entity_cache.cache.invalidate(("bookings", booking_id))
+    await occupancy.store.refresh(session, *previous_stay)
+    versioning.bump("bookings")
     return {"detail": "deleted"}
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from datetime import date
 from typing import List
-from sqlalchemy import select
+from sqlalchemy import delete, exists, insert, or_, select, update
 from pydantic import BaseModel
 
+import bulk
 import database
+import entity_cache
+import fast_json
+import fieldsets
+import occupancy
+import tracing
+import versioning
+from availability import available_rooms_query
+from pagination import PageParams
 
 router = APIRouter(prefix="/rooms", tags=["rooms"])
 
@@ -19,53 +29,288 @@ class RoomSchema(BaseModel):
     description: str | None = None
 
 
-@router.get("/", response_model=List[RoomSchema])
-async def list_rooms(session=Depends(database.get_session)):
-    res = await session.execute(select(database.RoomModel))
-    rows = res.scalars().all()
-    return [RoomSchema(id=r.id, title=r.title, price=r.price, type=r.type, capacity=r.capacity, image_url=r.image_url, status=r.status, description=r.description) for r in rows]
+# Columns handed back by INSERT/UPDATE ... RETURNING, in RoomSchema field order
+ROOM_COLUMNS = [getattr(database.RoomModel, name) for name in RoomSchema.model_fields]
 
+ROOM_IN_USE = "Room has bookings; cancel or move them to another room, or change its status instead"
 
-@router.get("/{room_id}", response_model=RoomSchema)
-async def get_room(room_id: int, session=Depends(database.get_session)):
+
+class RoomCalendarSchema(BaseModel):
+    room_id: int
+    month: str
+    nights: List[bool]
+    occupied_nights: int
+    occupancy_rate: float
+
+
+class OccupancyRateSchema(BaseModel):
+    start: date
+    end: date
+    rooms: int
+    room_nights: int
+    occupied_nights: int
+    occupancy_rate: float
+
+
+@router.get("/", response_model=List[RoomSchema], dependencies=[Depends(versioning.conditional_get("rooms"))])
+async def list_rooms(
+    response: Response,
+    page: PageParams = Depends(),
+    status: str | None = None,
+    type: str | None = None,
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    min_capacity: int | None = Query(None, ge=0),
+    fields=Depends(fieldsets.sparse_fields(ROOM_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    stmt = select(*fields)
+    if status is not None:
+        stmt = stmt.where(database.RoomModel.status == status)
+    if type is not None:
+        stmt = stmt.where(database.RoomModel.type == type)
+    if min_price is not None:
+        stmt = stmt.where(database.RoomModel.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(database.RoomModel.price <= max_price)
+    if min_capacity is not None:
+        stmt = stmt.where(database.RoomModel.capacity >= min_capacity)
+    res = await session.execute(page.apply(stmt, database.RoomModel))
+    return fast_json.rows_response(res.keys(), page.finish(res, response), response)
+
+
+@router.get("/search", response_model=List[RoomSchema], dependencies=[Depends(versioning.conditional_get("rooms"))])
+async def search_rooms(
+    response: Response,
+    page: PageParams = Depends(),
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    min_capacity: int | None = Query(None, ge=0),
+    type: str | None = None,
+    amenities: List[str] = Query([]),
+    fields=Depends(fieldsets.sparse_fields(ROOM_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    """Search rooms by price, capacity, type and amenity tags.
+
+    Price, capacity and type are served by their column indexes. Rooms have no
+    amenities column yet, so a room matches when any requested tag appears in
+    its title, type or description.
+    """
+    model = database.RoomModel
+    stmt = select(*fields)
+    if min_price is not None:
+        stmt = stmt.where(model.price >= min_price)
+    if max_price is not None:
+        stmt = stmt.where(model.price <= max_price)
+    if min_capacity is not None:
+        stmt = stmt.where(model.capacity >= min_capacity)
+    if type is not None:
+        stmt = stmt.where(model.type == type)
+    tags = [tag.strip() for tag in amenities if tag.strip()]
+    if tags:
+        stmt = stmt.where(or_(*[
+            # autoescape: a % or _ in a tag is matched literally, not as a wildcard
+            column.icontains(tag, autoescape=True)
+            for tag in tags
+            for column in (model.title, model.type, model.description)
+        ]))
+    res = await session.execute(page.apply(stmt, model))
+    return fast_json.rows_response(res.keys(), page.finish(res, response), response)
+
+
+@router.get("/available", response_model=List[RoomSchema], dependencies=[Depends(versioning.conditional_get("rooms", "bookings"))])
+async def available_rooms(
+    response: Response,
+    checkin: date,
+    checkout: date,
+    guests: int | None = Query(None, ge=1),
+    fields=Depends(fieldsets.sparse_fields(ROOM_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    """Rooms that are free for every night from checkin up to (not including) checkout."""
+    if checkout <= checkin:
+        raise HTTPException(status_code=400, detail="checkout must be after checkin")
+    stmt, params = available_rooms_query(checkin, checkout, guests)
+    if fields is not ROOM_COLUMNS:
+        stmt = stmt.with_only_columns(*fields)
+    res = await session.execute(stmt, params)
+    return fast_json.rows_response(res.keys(), res.all(), response)
+
+
+@router.get("/occupancy", response_model=OccupancyRateSchema, dependencies=[Depends(versioning.conditional_get("rooms", "bookings"))])
+async def occupancy_rate(start: date, end: date, session=Depends(database.get_read_session)):
+    """Portfolio-wide share of room-nights booked in [start, end), read from the occupancy bitmaps."""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    res = await session.execute(select(database.RoomModel.id))
+    room_ids = res.scalars().all()
+    nights = (end - start).days
+    occupied = sum(occupancy.store.occupied_nights(room_id, start, end) for room_id in room_ids)
+    room_nights = nights * len(room_ids)
+    return OccupancyRateSchema(
+        start=start,
+        end=end,
+        rooms=len(room_ids),
+        room_nights=room_nights,
+        occupied_nights=occupied,
+        occupancy_rate=occupied / room_nights if room_nights else 0.0,
+    )
+
+
+@router.get("/{room_id}/calendar", response_model=RoomCalendarSchema, dependencies=[Depends(versioning.conditional_get("rooms", "bookings"))])
+async def room_calendar(
+    room_id: int,
+    month: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="Month as YYYY-MM"),
+    session=Depends(database.get_read_session),
+):
+    """Night-by-night occupancy of one room for a calendar month."""
     r = await session.get(database.RoomModel, room_id)
     if not r:
         raise HTTPException(status_code=404, detail="Room not found")
-    return RoomSchema(id=r.id, title=r.title, price=r.price, type=r.type, capacity=r.capacity, image_url=r.image_url, status=r.status, description=r.description)
+    try:
+        start, end = occupancy.month_range(month)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    nights = (end - start).days
+    occupied = occupancy.store.occupied_nights(room_id, start, end)
+    return RoomCalendarSchema(
+        room_id=room_id,
+        month=month,
+        nights=occupancy.store.nights(room_id, start, end),
+        occupied_nights=occupied,
+        occupancy_rate=occupied / nights,
+    )
+
 
+@router.get("/{room_id}", response_model=RoomSchema, dependencies=[Depends(versioning.conditional_get("rooms"))])
+async def get_room(
+    room_id: int,
+    response: Response,
+    fields=Depends(fieldsets.sparse_fields(ROOM_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    async def load():
+        r = await session.get(database.RoomModel, room_id)
+        if not r:
+            return None
+        return RoomSchema(id=r.id, title=r.title, price=r.price, type=r.type, capacity=r.capacity, image_url=r.image_url, status=r.status, description=r.description).model_dump()
+
+    room = await entity_cache.cache.get_or_load(("rooms", room_id), load)
+    if room is None:
+        raise HTTPException(status_code=404, detail="Room not found")
+    if fields is not ROOM_COLUMNS:
+        return fast_json.json_response(fieldsets.project(room, fields), response)
+    return room
 
-@router.post("/", response_model=RoomSchema)
+
+@router.post("/", response_model=RoomSchema, dependencies=[Depends(tracing.budget(1))])
 async def create_room(room: RoomSchema, session=Depends(database.get_session)):
-    obj = database.RoomModel(title=room.title, price=room.price, type=room.type, capacity=room.capacity, image_url=room.image_url, status=room.status, description=room.description)
-    session.add(obj)
+    res = await session.execute(
+        insert(database.RoomModel).values(**room.model_dump(exclude={"id"})).returning(*ROOM_COLUMNS)
+    )
+    row = res.one()
     await session.commit()
-    await session.refresh(obj)
-    return RoomSchema(id=obj.id, title=obj.title, price=obj.price, type=obj.type, capacity=obj.capacity, image_url=obj.image_url, status=obj.status, description=obj.description)
+    versioning.bump("rooms")
+    return RoomSchema(**row._mapping)
+
+
+@router.post("/bulk", response_model=bulk.BulkResponse)
+async def bulk_rooms(req: bulk.BulkRequest, session=Depends(database.get_session)):
+    """Create, update and delete many rooms in one transaction, with a result per item."""
+    model = database.RoomModel
+    results = []
+    creates = bulk.validate_items(RoomSchema, req.create, "create", results)
+    updates = bulk.validate_items(RoomSchema, req.update, "update", results)
 
+    known = await bulk.existing_ids(session, model, [r.id for _, r in updates] + req.delete)
+    claimed = set()
+    update_targets = dict(bulk.check_targets("update", [(i, r.id) for i, r in updates], known, claimed, results))
+    delete_targets = bulk.check_targets("delete", list(enumerate(req.delete)), known, claimed, results)
+    updates = [(i, r) for i, r in updates if i in update_targets and update_targets[i] == r.id]
 
-@router.put("/{room_id}", response_model=RoomSchema)
+    # Rooms that bookings still point at are kept, see delete_room
+    if delete_targets:
+        booking = database.BookingModel
+        res = await session.execute(
+            select(booking.room_id).distinct().where(booking.room_id.in_([i for _, i in delete_targets]))
+        )
+        booked = set(res.scalars().all())
+        for index, item_id in delete_targets:
+            if item_id in booked:
+                results.append(bulk.BulkItemResult(op="delete", index=index, id=item_id, status="error", detail=ROOM_IN_USE))
+        delete_targets = [(index, item_id) for index, item_id in delete_targets if item_id not in booked]
+
+    if creates:
+        res = await session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            [r.model_dump(exclude={"id"}) for _, r in creates],
+        )
+        for (index, _), new_id in zip(creates, res.scalars().all()):
+            results.append(bulk.BulkItemResult(op="create", index=index, id=new_id, status="created"))
+    if updates:
+        await session.execute(update(model), [r.model_dump() for _, r in updates])
+        for index, r in updates:
+            results.append(bulk.BulkItemResult(op="update", index=index, id=r.id, status="updated"))
+    if delete_targets:
+        await session.execute(delete(model).where(model.id.in_([i for _, i in delete_targets])))
+        for index, item_id in delete_targets:
+            results.append(bulk.BulkItemResult(op="delete", index=index, id=item_id, status="deleted"))
+    await session.commit()
+
+    for _, r in updates:
+        entity_cache.cache.invalidate(("rooms", r.id))
+    for _, item_id in delete_targets:
+        entity_cache.cache.invalidate(("rooms", item_id))
+    if updates or delete_targets:
+        # Cached bookings embed their room's title, type, price and image
+        entity_cache.cache.invalidate_kind("bookings")
+    if creates or updates or delete_targets:
+        versioning.bump("rooms")
+    return bulk.summarize(results)
+
+
+@router.put("/{room_id}", response_model=RoomSchema, dependencies=[Depends(tracing.budget(1))])
 async def update_room(room_id: int, room: RoomSchema, session=Depends(database.get_session)):
-    obj = await session.get(database.RoomModel, room_id)
-    if not obj:
+    model = database.RoomModel
+    res = await session.execute(
+        update(model)
+        .where(model.id == room_id)
+        .values(**room.model_dump(exclude={"id"}))
+        .returning(*ROOM_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = res.one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Room not found")
-    obj.title = room.title
-    obj.price = room.price
-    obj.type = room.type
-    obj.capacity = room.capacity
-    obj.image_url = room.image_url
-    obj.status = room.status
-    obj.description = room.description
-    session.add(obj)
     await session.commit()
-    await session.refresh(obj)
-    return RoomSchema(id=obj.id, title=obj.title, price=obj.price, type=obj.type, capacity=obj.capacity, image_url=obj.image_url, status=obj.status, description=obj.description)
+    entity_cache.cache.invalidate(("rooms", room_id))
+    entity_cache.cache.invalidate_kind("bookings")
+    versioning.bump("rooms")
+    return RoomSchema(**row._mapping)
 
 
-@router.delete("/{room_id}")
+@router.delete("/{room_id}", dependencies=[Depends(tracing.budget(2))])
 async def delete_room(room_id: int, session=Depends(database.get_session)):
-    obj = await session.get(database.RoomModel, room_id)
-    if not obj:
+    """Delete a room that no booking refers to.
+
+    Bookings point at their room by id, so a room with bookings (including
+    past or cancelled ones) is refused with 409; they keep showing its
+    current title. Set its status instead to take it out of service.
+    """
+    model = database.RoomModel
+    booked = exists().where(database.BookingModel.room_id == room_id)
+    res = await session.execute(
+        delete(model).where(model.id == room_id, ~booked).returning(model.id).execution_options(synchronize_session=False)
+    )
+    if res.scalar_one_or_none() is None:
+        # Only a refused delete pays for telling the two cases apart
+        res = await session.execute(select(model.id).where(model.id == room_id))
+        if res.scalar_one_or_none() is not None:
+            raise HTTPException(status_code=409, detail=ROOM_IN_USE)
         raise HTTPException(status_code=404, detail="Room not found")
-    await session.delete(obj)
     await session.commit()
+    entity_cache.cache.invalidate(("rooms", room_id))
+    entity_cache.cache.invalidate_kind("bookings")
+    versioning.bump("rooms")
     return {"detail": "deleted"}
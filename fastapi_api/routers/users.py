@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from typing import List
-from sqlalchemy import select
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 
 import database
+import entity_cache
+import fast_json
+import fieldsets
+import tracing
+import versioning
+from pagination import PageParams
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -15,49 +22,112 @@ class UserSchema(BaseModel):
     full_name: str | None = None
 
 
-@router.get("/", response_model=List[UserSchema])
-async def list_users(session=Depends(database.get_session)):
-    res = await session.execute(select(database.UserModel))
-    rows = res.scalars().all()
-    return [UserSchema(id=r.id, username=r.username, email=r.email, full_name=r.full_name) for r in rows]
+# Columns handed back by INSERT/UPDATE ... RETURNING, in UserSchema field order
+USER_COLUMNS = [getattr(database.UserModel, name) for name in UserSchema.model_fields]
 
+USERNAME_TAKEN = "Username already exists"
 
-@router.post("/", response_model=UserSchema)
+
+@router.get("/", response_model=List[UserSchema], dependencies=[Depends(versioning.conditional_get("users"))])
+async def list_users(
+    response: Response,
+    page: PageParams = Depends(),
+    username: str | None = None,
+    email: str | None = None,
+    fields=Depends(fieldsets.sparse_fields(USER_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    stmt = select(*fields)
+    if username is not None:
+        stmt = stmt.where(func.lower(database.UserModel.username) == func.lower(username))
+    if email is not None:
+        stmt = stmt.where(database.UserModel.email == email)
+    res = await session.execute(page.apply(stmt, database.UserModel))
+    return fast_json.rows_response(res.keys(), page.finish(res, response), response)
+
+
+@router.post("/", response_model=UserSchema, dependencies=[Depends(tracing.budget(1))])
 async def create_user(u: UserSchema, session=Depends(database.get_session)):
-    obj = database.UserModel(username=u.username, email=u.email, full_name=u.full_name)
-    session.add(obj)
+    try:
+        res = await session.execute(
+            insert(database.UserModel).values(**u.model_dump(exclude={"id"})).returning(*USER_COLUMNS)
+        )
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=USERNAME_TAKEN)
+    row = res.one()
     await session.commit()
-    await session.refresh(obj)
-    return UserSchema(id=obj.id, username=obj.username, email=obj.email, full_name=obj.full_name)
+    versioning.bump("users")
+    return UserSchema(**row._mapping)
+
+
+@router.get("/by-username/{username}", response_model=UserSchema, dependencies=[Depends(versioning.conditional_get("users"))])
+async def get_user_by_username(
+    username: str,
+    response: Response,
+    fields=Depends(fieldsets.sparse_fields(USER_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    """Case-insensitive lookup, a single seek on ix_users_username_lower."""
+    model = database.UserModel
+    res = await session.execute(select(*fields).where(func.lower(model.username) == func.lower(username)))
+    row = res.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return fast_json.json_response(dict(row._mapping), response)
+
 
+@router.get("/{user_id}", response_model=UserSchema, dependencies=[Depends(versioning.conditional_get("users"))])
+async def get_user(
+    user_id: int,
+    response: Response,
+    fields=Depends(fieldsets.sparse_fields(USER_COLUMNS)),
+    session=Depends(database.get_read_session),
+):
+    async def load():
+        obj = await session.get(database.UserModel, user_id)
+        if not obj:
+            return None
+        return UserSchema(id=obj.id, username=obj.username, email=obj.email, full_name=obj.full_name).model_dump()
 
-@router.get("/{user_id}", response_model=UserSchema)
-async def get_user(user_id: int, session=Depends(database.get_session)):
-    obj = await session.get(database.UserModel, user_id)
-    if not obj:
+    user = await entity_cache.cache.get_or_load(("users", user_id), load)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return UserSchema(id=obj.id, username=obj.username, email=obj.email, full_name=obj.full_name)
+    if fields is not USER_COLUMNS:
+        return fast_json.json_response(fieldsets.project(user, fields), response)
+    return user
 
 
-@router.put("/{user_id}", response_model=UserSchema)
+@router.put("/{user_id}", response_model=UserSchema, dependencies=[Depends(tracing.budget(1))])
 async def update_user(user_id: int, u: UserSchema, session=Depends(database.get_session)):
-    obj = await session.get(database.UserModel, user_id)
-    if not obj:
+    model = database.UserModel
+    try:
+        res = await session.execute(
+            update(model)
+            .where(model.id == user_id)
+            .values(**u.model_dump(exclude={"id"}))
+            .returning(*USER_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail=USERNAME_TAKEN)
+    row = res.one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="User not found")
-    obj.username = u.username
-    obj.email = u.email
-    obj.full_name = u.full_name
-    session.add(obj)
     await session.commit()
-    await session.refresh(obj)
-    return UserSchema(id=obj.id, username=obj.username, email=obj.email, full_name=obj.full_name)
+    entity_cache.cache.invalidate(("users", user_id))
+    versioning.bump("users")
+    return UserSchema(**row._mapping)
 
 
-@router.delete("/{user_id}")
+@router.delete("/{user_id}", dependencies=[Depends(tracing.budget(1))])
 async def delete_user(user_id: int, session=Depends(database.get_session)):
-    obj = await session.get(database.UserModel, user_id)
-    if not obj:
+    model = database.UserModel
+    res = await session.execute(
+        delete(model).where(model.id == user_id).returning(model.id).execution_options(synchronize_session=False)
+    )
+    if res.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="User not found")
-    await session.delete(obj)
     await session.commit()
+    entity_cache.cache.invalidate(("users", user_id))
+    versioning.bump("users")
     return {"detail": "deleted"}
@@ -0,0 +1,143 @@
+"""Per-request SQL tracing: statement counts, DB time and budget warnings.
+
+``TracingMiddleware`` opens a ``Trace`` for every HTTP request and keeps it in
+a context variable. The cursor events installed by ``instrument_engine`` run
+inside the request's context (SQLAlchemy carries it into the greenlet that
+drives the async driver), so each statement is charged to the request that
+issued it without passing anything through the routers.
+
+When the response starts, the totals are sent back in a ``Server-Timing``
+header (``db;dur=1.8;desc="3 queries", app;dur=4.2``) and the request is
+checked against its statement budget: ``QUERY_BUDGET`` by default, or the
+value a route declares with ``dependencies=[tracing.budget(n)]``. A request
+that repeats one statement ``N_PLUS_ONE_REPEATS`` times or more is reported
+as a likely N+1. Single statements slower than ``SLOW_QUERY_MS`` are logged
+with their parameters.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger("staycation.sql")
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "100"))
+QUERY_BUDGET = int(os.environ.get("QUERY_BUDGET", "10"))
+N_PLUS_ONE_REPEATS = int(os.environ.get("N_PLUS_ONE_REPEATS", "5"))
+
+
+class Trace:
+    __slots__ = ("statements", "db_time", "budget", "seen", "started", "last_context")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.budget = QUERY_BUDGET
+        self.seen = Counter()
+        self.started = time.perf_counter()
+        self.last_context = None
+
+    def server_timing(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.statements} queries", '
+            f"app;dur={elapsed * 1000:.1f}"
+        )
+
+    def report(self, method: str, path: str):
+        """Log budget overruns and statements repeated often enough to look like N+1."""
+        if self.statements > self.budget:
+            logger.warning(
+                "%s %s ran %d SQL statements (budget %d, %.1f ms in the database)",
+                method, path, self.statements, self.budget, self.db_time * 1000,
+            )
+        for statement, count in self.seen.items():
+            if count >= N_PLUS_ONE_REPEATS:
+                logger.warning("%s %s ran the same statement %d times (likely N+1): %s", method, path, count, statement)
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("sql_trace", default=None)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def detach():
+    """Stop charging statements in this context to the request that spawned it.
+
+    For background tasks (e.g. a write-batch flush) that inherit the context
+    of whichever request happened to schedule them.
+    """
+    _current.set(None)
+
+
+def budget(statements: int):
+    """Route dependency overriding the statement budget: ``dependencies=[tracing.budget(3)]``."""
+
+    async def set_budget():
+        trace = _current.get()
+        if trace is not None:
+            trace.budget = statements
+
+    return set_budget
+
+
+class TracingMiddleware:
+    """ASGI middleware that traces each HTTP request's SQL and adds ``Server-Timing``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = _current.set(trace)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+                trace.report(scope["method"], scope["path"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+
+def instrument_engine(async_engine):
+    """Charge every statement on ``async_engine`` to the current request's trace."""
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            context._trace_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        trace = _current.get()
+        if trace is None:
+            return
+        elapsed = time.perf_counter() - context._trace_start
+        trace.db_time += elapsed
+        # An executemany that SQLAlchemy splits into several cursor calls
+        # (e.g. INSERT ... RETURNING row by row on SQLite) shares one
+        # execution context and counts as the single statement it was issued as
+        if context is not trace.last_context:
+            trace.last_context = context
+            trace.statements += 1
+            trace.seen[statement] += 1
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            if executemany:
+                parameters = f"<{len(parameters)} parameter sets>"
+            logger.warning("Slow query (%.1f ms): %s | parameters: %r", elapsed * 1000, statement, parameters)
@@ -0,0 +1,39 @@
+import uuid
+from typing import Dict
+
+from fastapi import HTTPException, Request, Response
+
+# Distinguishes ETags issued before and after a restart, when counters reset
+_BOOT_ID = uuid.uuid4().hex[:12]
+
+_versions: Dict[str, int] = {"rooms": 0, "bookings": 0, "users": 0}
+
+
+def bump(table: str):
+    """Record a committed write to ``table``; every ETag derived from it changes."""
+    _versions[table] += 1
+
+
+def etag(*tables: str) -> str:
+    """Strong ETag for a response built only from ``tables``."""
+    return '"' + "-".join([_BOOT_ID] + [f"{t}.{_versions[t]}" for t in tables]) + '"'
+
+
+def conditional_get(*tables: str):
+    """Dependency that answers ``If-None-Match`` with 304 before any query runs.
+
+    Successful responses carry the ETag and ``Cache-Control: no-cache`` so
+    browsers and the Django client revalidate instead of re-downloading.
+    Versions are per process: run one worker, or clients may be told 304
+    for a write another worker served.
+    """
+    async def dependency(request: Request, response: Response):
+        tag = etag(*tables)
+        headers = {"ETag": tag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            candidates = [c.strip() for c in if_none_match.split(",")]
+            if tag in candidates or "*" in candidates:
+                raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return dependency
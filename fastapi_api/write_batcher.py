@@ -0,0 +1,106 @@
+import asyncio
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+import database
+import occupancy
+import tracing
+import versioning
+from availability import INACTIVE_BOOKING_STATUSES, claim_stay, held_stays
+
+# Opt-in: when off, create_booking commits every booking on its own
+ENABLED = os.environ.get("BOOKING_WRITE_BATCHING", "0").lower() in ("1", "true", "yes")
+
+
+class BookingWriteBatcher:
+    """Group-commit queue for booking inserts.
+
+    Concurrent ``submit`` calls are collected and written in one transaction
+    once ``max_items`` rows are waiting or ``max_delay`` seconds have passed
+    since the first one arrived, so a burst pays for one commit instead of
+    one per booking. Overlaps are checked for the whole batch with one query
+    and only fail the conflicting caller; the accepted rows are then written
+    with a single executemany INSERT ... RETURNING and every caller gets back
+    its own id or error. A batch that fills up while an earlier one is still
+    being written starts its own flush, which waits for the write lock.
+    """
+
+    def __init__(self, max_items: int = 64, max_delay: float = 0.005):
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+
+    async def submit(self, row: dict) -> int:
+        """Queue one booking row (model column values) and wait for its id."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_items:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_now)
+        return await future
+
+    async def drain(self):
+        """Flush anything queued and wait for in-progress flushes (used at shutdown)."""
+        if self._pending:
+            self._flush_now()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        # The task inherited the context of whichever request scheduled it
+        tracing.detach()
+        model = database.BookingModel
+        accepted, new_ids = [], []
+        try:
+            async with database.AsyncSessionLocal() as session:
+                # Flushes run one at a time from here to the commit, so each
+                # batch sees the rows every earlier batch wrote
+                await database.begin_immediate(session)
+                held = await held_stays(session, [row for row, _ in batch])
+                for row, future in batch:
+                    if not claim_stay(held, row):
+                        if not future.done():
+                            future.set_exception(HTTPException(status_code=409, detail="Room is already booked for these dates"))
+                        continue
+                    accepted.append((row, future))
+                if accepted:
+                    res = await session.execute(
+                        insert(model).returning(model.id, sort_by_parameter_order=True),
+                        [row for row, _ in accepted],
+                    )
+                    new_ids = res.scalars().all()
+                    await session.commit()
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (row, future), new_id in zip(accepted, new_ids):
+            if row["status"] not in INACTIVE_BOOKING_STATUSES:
+                occupancy.store.add(row["room_id"], row["checkin_date"], row["checkout_date"])
+            if not future.done():
+                future.set_result(new_id)
+        if accepted:
+            versioning.bump("bookings")
+
+
+batcher = BookingWriteBatcher(
+    max_items=int(os.environ.get("BOOKING_BATCH_MAX_ITEMS", "64")),
+    max_delay=float(os.environ.get("BOOKING_BATCH_MAX_DELAY_MS", "5")) / 1000,
+)
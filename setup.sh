@@ -73,6 +73,7 @@ echo "=========================================="
 echo ""
 echo "To start the FastAPI server:"
 echo "  cd fastapi_api"
+echo "  python database.py --seed   # first run only: sample data"
 echo "  uvicorn main:app --reload"
 echo ""
 echo "To start the Django development server:"